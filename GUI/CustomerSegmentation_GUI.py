@@ -1,241 +1,166 @@
 import streamlit as st
 st.set_page_config(page_title = 'Customer Segmentation', page_icon = 'person-bounding-box', layout = 'centered')
 
+import os
 from streamlit_option_menu import option_menu
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-from sklearn.cluster import KMeans
-from sklearn import metrics
-from sklearn.metrics import silhouette_score
-from sklearn import preprocessing
-import pickle
-from joblib import load
+from rfm_rules import label_kmeans, label_predictions
+from storage import load_df
+from segment_summary import segment_summary, aggregation_table, dataset_version
+from rfm_rules import RFM_RULES
+from instrumentation import Profiler
+from customer_table import load_customers, columns_view, with_column
+# matplotlib, seaborn, plotly, sklearn and the models are imported inside the functions
+# that use them, so a page only pays for what it draws (see benchmarks/bench_startup.py)
+
+# one profiler per server process: every cached function below records its duration,
+# cache hit/miss, input rows and memory delta (see instrumentation.py)
+@st.cache_resource
+def get_profiler():
+  return Profiler()
+
+# records are tagged with the browser session, so the diagnostics panel only shows
+# the current user's stages
+def session_id():
+  from streamlit.runtime.scriptrunner import get_script_run_ctx
+  ctx = get_script_run_ctx()
+  return None if ctx is None else ctx.session_id
+
+profiler = get_profiler()
+profiler.set_session(session_id())
+run_start = profiler.seq
 
 #--------------------------------- RFM Analysis -------------------------------------
-plt.style.use('seaborn-whitegrid')
-# read RFM data
-@st.cache_data
-def load_csv_df(df):
-  df =  pd.read_csv(df)
+# read RFM data (typed .feather copy next to the csv is used when present, see storage.py)
+@profiler.cached(st.cache_data)
+def load_csv_df(df, columns = None):
+  df =  load_df(df, columns = columns)
   return df
-rfm_df = load_csv_df(df = 'data/RFM_data.csv')    
-
-# customer labeling
-def rfm_label(df):
-  if df.R == 1 or df.R == 2:
-    return "Left"
-  elif (df.R == 3 or df.R == 4) and df.F != 4:
-    return "Regular"
-  elif (df.R == 3) and df.F == 4 and df.M == 4:
-    return "Leaving"
-  else:
-    return "Loyal"
-
-@st.cache_data
-def rfm_labeling(rfm_df):
-  rfm_df['RFM_label'] = rfm_df.apply(rfm_label, axis=1)
-  return rfm_df
-
-# RFM aggregration
-@st.cache_data
-def rfm_aggregation(df, label, agg_dict):
-  rfm_agg = df.groupby(label).agg(agg_dict).round(0)
-  rfm_agg.columns = rfm_agg.columns.droplevel()
-  rfm_agg.columns = ['RecencyMean', 'FrequencyMean', 'MonetaryMean', 'Count']
-  rfm_agg['Percent'] = round(rfm_agg['Count']*100/rfm_agg.Count.sum(), 2)
-  rfm_agg = rfm_agg.reset_index()
+
+# raw file content for download buttons
+@profiler.cached(st.cache_data)
+def load_bytes(path):
+  with open(path, 'rb') as f:
+    return f.read()
+
+# compact customer table with its categorical RFM_label (rules live in
+# rfm_rules.RFM_RULES), one read-only copy shared by all sessions; pages take views
+# of it (see customer_table.py)
+@profiler.cached(st.cache_resource)
+def customer_table(path, version):
+  # version (dataset_version(path)) is only part of the cache key, so a rewritten
+  # data file gives a new table
+  return load_customers(path)
+
+# RFM labels only change with the data file or the rules
+RFM_VERSION = (dataset_version('data/RFM_data.csv'), repr(RFM_RULES))
+
+# matplotlib figures are cached as rendered PNGs keyed by data version / fingerprint
+# (see figure_cache.py) and shown with st.image
+@st.cache_resource
+def figure_cache():
+  import matplotlib.pyplot as plt
+  from figure_cache import FigureCache, code_version
+  plt.style.use('seaborn-whitegrid')
+  here = os.path.dirname(os.path.abspath(__file__))
+  return FigureCache(code_version = code_version(*[os.path.join(here, f) for f in ('plots.py', 'large_plots.py')]))
+
+def show_png(name, render, data = None, version = None, **params):
+  with profiler.stage(name, rows = None if data is None else len(data)) as stage:
+    png, stage.hit = figure_cache().fetch(name, render, data = data, version = version, **params)
+  st.image(png, use_column_width = True)
+
+# RFM aggregration, from the per-segment summary (see segment_summary.py)
+@profiler.cached(st.cache_data)
+def rfm_aggregation(summary, label):
+  rfm_agg = aggregation_table(summary, label)
   return rfm_agg
 
-# Clusters bubble plot
-@st.cache_data
+# Clusters bubble plot (the figures themselves are built in plots.py)
+@profiler.cached(st.cache_data)
 def bubble_plot(df_agg, label):
-  fig = px.scatter(df_agg, x="RecencyMean", y="FrequencyMean", size="MonetaryMean", color=label,
-                  hover_name=label, size_max=100)
-  return fig
-
-# scatter plot
-@st.cache_data
-def scatter_plot(df, label, palette = 'Spectral'):
-  scatter_fig = plt.figure(figsize = (11, 5))
-  plt.subplot(1,2,1)
-  sns.scatterplot(data = df, x = 'Frequency', y = 'Recency', hue = label, palette = palette)
-  plt.ylabel('Recency', fontsize = 12)
-  plt.xlabel('Frequency', fontsize = 12)
-  plt.subplot(1,2,2)
-  sns.scatterplot(data = df, x = 'Monetary', y = 'Recency', hue = label, palette = palette)
-  plt.xlim([0, 3000])
-  plt.ylabel(None)
-  plt.xlabel('Monetary Value', fontsize = 12)
-  plt.tight_layout()
+  import plots
+  return plots.bubble_plot(df_agg, label)
+
+# scatter plot (large customer sets are sampled or rasterized, see large_plots.py)
+def scatter_plot(df, label, palette = 'Spectral', mode = 'auto', budget = 10_000):
+  from large_plots import segment_scatter
+  scatter_fig = segment_scatter(df, label, palette = palette, mode = mode, budget = budget)
   return scatter_fig
 
 # clusters by quantity
-@st.cache_data
-def qua_rev_plot(df, label, palette_1, palette_2):
-  count = df[label].value_counts(normalize=True)*100
-  sum = df[['Monetary',label]].groupby(label).sum()
-  sum['percent'] = round(sum['Monetary']*100/df.Monetary.sum(),2)
+def qua_rev_plot(summary, label, palette_1, palette_2):
+  import plots
+  return plots.qua_rev_plot(summary, label, palette_1, palette_2)
 
-  plt.style.use('seaborn-whitegrid')
-  qua_re_fig = plt.figure(figsize = (10, 5))
-  plt.subplot(1,2,1)
-  ax_q = sns.barplot(data = count, 
-              x = count.index.tolist(), y = count.values,
-              orient = 'h',
-              palette = palette_1)
-  ytick = [str(x) for x in count.index.tolist()]
-  ax_q.set_yticklabels(ytick, fontsize=13)
-  plt.setp(ax_q.get_xticklabels(), fontsize = 13)
-  ax_q.set_title("Customers' count by each cluster (%)", fontsize=17)
-  ax_q.set_ylabel('Labels', fontsize = 15)
-  ax_q.set_xlabel(None)
-  # clusters by revenues
-  plt.subplot(1,2,2)
-  ax_r = sns.barplot(y = sum.sort_values(by='percent').index, 
-              x=sum.sort_values(by='percent').percent, 
-              palette = palette_2, orient='h')
-  ytick = [str(x) for x in sum.sort_values(by='percent').index.values.tolist()]
-  ax_r.set_yticklabels(ytick, fontsize = 13)
-  ax_r.set_xlim(0, 60)
-  ax_r.set_ylabel(None)
-  ax_r.set_xlabel(None)
-  ax_r.set_title('Total revenue by customer clusters (%)', fontsize = 17)
-  plt.setp(ax_r.get_xticklabels(), fontsize=13)
-  plt.tight_layout()
-  return qua_re_fig
 #--------------------------------- KMeans Clustering -----------------------------------
-def labeling(df):
-  if df['K_label'] == 1:
-    return "Left"
-  elif df['K_label'] == 2:
-    return "Potential"
-  elif df['K_label'] == 3:
-    return "Star"
-  else:
-    return "Regular"
-@st.cache_data
+# cluster names live in rfm_rules.K_LABELS
+@profiler.cached(st.cache_data)
 def k_labeling(df):
-  k_df = df.copy()
-  k_df['label'] = k_df.apply(labeling, axis = 1)
-  return k_df
+  return with_column(df, 'label', label_kmeans(df['K_label']))
 
-@st.cache_data
+# view of the shared customer table, no copy
 def extract_cols(df, col_lst):
-  new_df = rfm_df[col_lst]
-  return new_df
+  return columns_view(customer_table(df, dataset_version(df)), col_lst)
 
 # distribution and boxplot
-@st.cache_data
 def dis_box_plot(df):
-  dis_box_fig = plt.figure(figsize=(10,8))
-  plt.subplot(3, 2, 1)
-  sns.distplot(df['Recency'], color = 'c')
-  plt.subplot(3, 2, 3)
-  sns.distplot(df['Frequency'], color = 'c')
-  plt.subplot(3, 2, 5)
-  sns.distplot(df['Monetary'], color = 'c') 
-  plt.subplot(3, 2, 2)
-  sns.boxplot(df.Recency, color = 'c', orient = 'h')
-  plt.xlabel('Recency')
-  plt.subplot(3, 2, 4)
-  sns.boxplot(df.Frequency, color = 'c', orient = 'h')
-  plt.xlabel('Frequency')
-  plt.subplot(3, 2, 6)
-  sns.boxplot(df.Monetary, color = 'c', orient = 'h')
-  plt.xlabel('Monetary Value')
-  plt.tight_layout()
-  return dis_box_fig
-
-# scale df
-@st.cache_data
+  import plots
+  return plots.dis_box_plot(df)
+
+
+# scale df with the log1p + robust scaler fitted once with the KMeans artifact
+@profiler.cached(st.cache_resource)
 def robust_scale(df):
-  # log normalization
-  log_features = df.copy()
-  log_features['R_log'] = np.log1p(log_features['Recency'])
-  log_features['F_log'] = np.log1p(log_features['Frequency'])
-  log_features['M_log'] = np.log1p(log_features['Monetary'])
-  col_names = ['R_log', 'F_log','M_log']
-  features = log_features[col_names]
-  # Robust scaling
-  robust_scaler = preprocessing.RobustScaler()
-  scaled = robust_scaler.fit_transform(features)
+  scaled = load_scaler(KMEANS_MODEL).transform(df, copy = False)
   scale_df = pd.DataFrame(scaled, columns=df.columns.values.tolist())
   return scale_df
 
 # Picking best centroids with Elbow method
-@st.cache_data
-def k_best_plot(df):
-  silhouette = []
-  wsse = []
-  K=[]
-  for k in range(2, 10):
-      kmeans = KMeans(n_clusters = k)
-      kmeans.fit(df)
-      wsse.append(kmeans.inertia_/df.shape[0])
-      silhouette.append(silhouette_score(df, kmeans.labels_))
-      K.append(k)
-  
-  # plotting
-  k_best_fig = plt.figure(figsize=(10, 5))
-  plt.plot(K, wsse, c = 'c', marker = 'o', alpha = 0.8, label = 'WSSE')
-  plt.plot(K, silhouette, c = 'm', marker = 'o', alpha= 0.8, label = 'Silhouette')
-  plt.plot([5, 5], [0, 1], linestyle = '--', c = 'r', alpha = 0.7)
-  plt.ylim(0, 1)
-  plt.legend(loc = 'best')
-  plt.xlabel('Number of centroids', fontsize = 12)
-  plt.ylabel('Value', fontsize = 12)
-  plt.xticks(K, fontsize=10)
-  plt.yticks(fontsize=10)
-  plt.title('Elbow & Silhouette Method for optimal k', fontsize = 15)
-  plt.tight_layout()
-  return k_best_fig
-
-# Train model
-@st.cache_data
-def kmeans_model(train_df, label_df):
-  model = KMeans(n_clusters = 5)
-  model.fit(train_df)
-  # get centroids and labels
-  centroids = model.cluster_centers_
-  labels = model.labels_
-  label_df['K_label'] = pd.Series(labels)
-  return centroids, label_df
-
-@st.cache_data
-def df_aggregation(df, label, agg_dict):
-  df_agg = df.groupby(label).agg(agg_dict).round(0)
-  df_agg.columns = df_agg.columns.droplevel()
-  df_agg.columns = ['RecencyMean', 'FrequencyMean', 'MonetaryMean', 'Count']
-  df_agg['Percent'] = round(df_agg['Count']*100/df_agg.Count.sum(), 2)
-  df_agg = df_agg.reset_index()
+def k_best_plot(df, silhouette_mode = 'sample', sample_size = 5000):
+  import plots
+  return plots.k_best_plot(df, silhouette_mode, sample_size)
+
+
+# KMeans is trained offline with a fixed seed (python kmeans_artifact.py) and only loaded
+# here; its cluster ids are assigned from the centroids to match rfm_rules.K_LABELS
+KMEANS_MODEL = 'Saved_models/kmeans_rfm.joblib'
+
+@profiler.cached(st.cache_resource)
+def load_kmeans(model_name):
+  from kmeans_artifact import KMeansArtifact
+  return KMeansArtifact.load(model_name)
+
+# k_df shares the feature columns of label_df and adds uint8 cluster ids
+@profiler.cached(st.cache_resource)
+def kmeans_model(label_df, model_name = KMEANS_MODEL):
+  kmeans = load_kmeans(model_name)
+  k_df = with_column(label_df, 'K_label', kmeans.assign(label_df).astype(np.uint8))
+  return kmeans.centroids, k_df
+
+@profiler.cached(st.cache_data)
+def df_aggregation(summary, label):
+  df_agg = aggregation_table(summary, label)
   return df_agg
 #------------------------ CLUSTERING WHOLE NEW FILE FROM USER --------------------------
-# # load scaler
-# @st.cache(allow_output_mutation=True)
-# def load_scaler(scaler_name):
-#   with open(scaler_name, 'rb') as f:
-#     scaler = pickle.load(f)
-#   return scaler
-
-# # log normalization
-# @st.cache_data
-# def log_normalize(df):
-#   log_features = df.copy()
-#   log_features['R_log'] = np.log1p(log_features['Recency'])
-#   log_features['F_log'] = np.log1p(log_features['Frequency'])
-#   log_features['M_log'] = np.log1p(log_features['Monetary'])
-#   col_names = ['R_log', 'F_log','M_log']
-#   log_df = log_features[col_names]
-#   return log_df 
+# load scaler (log1p + RobustScaler saved with the KMeans artifact, see rfm_scaler.py),
+# so uploaded customers are scaled exactly like the training data
+def load_scaler(model_name):
+  return load_kmeans(model_name).scaler
 
 # load model
-@st.cache(allow_output_mutation=True)
+@profiler.cached(st.cache_resource)
 def load_model(model_name):  
+  from joblib import load
   clf = load(model_name)
   return clf
+
+# compiled copy of DC_rmf.joblib for single-row predictions (python tree_predictor.py)
+@profiler.cached(st.cache_resource)
+def load_tree(tree_name):
+  from tree_predictor import TreePredictor
+  return TreePredictor.load(tree_name)
 # -------------------------------- GUI Setting -----------------------------------------
 # set page configuration
 # st.set_page_config(page_title='Customer_Segmentation', layout='centered')
@@ -291,7 +216,7 @@ Data includes the following fields:''')
       - Date of transaction
       - The number of CDs purchased
       - The dollar value of the transaction.''')
-    st.download_button(label = "Download Data", data = CDnow_Master.to_csv(index=False), 
+    st.download_button(label = "Download Data", data = load_bytes('data/CDnow_MasterData.csv'), 
                         file_name = 'CDnow_MasterData.csv', mime = 'text/csv')
     
     st.write('### IV. Project Objective')
@@ -310,6 +235,7 @@ elif choice == 'RFM Analysis':
     
     st.write('''The data used for analysis including 3 main features: "Recency", "Frequency", "Monetary Value"
              . The "R", "F", "M" features were engineered by calculating quantile for each feature.''')
+    rfm_df = customer_table('data/RFM_data.csv', dataset_version('data/RFM_data.csv'))
     code = """ 
 r_groups = pd.qcut(df_RFM['Recency'].rank(method='first'), q=4, labels=range(4, 0, -1))
 f_groups = pd.qcut(df_RFM['Frequency'].rank(method='first'), q=4, labels=range(1, 5, 1))
@@ -317,17 +243,15 @@ m_groups = pd.qcut(df_RFM['Monetary'].rank(method='first'), q=4, labels=range(1,
 df_rfm = df_RFM.assign(R = r_groups.values, F = f_groups.values,  M = m_groups.values)
     """
     st.code(code)
-    st.dataframe(rfm_df.head(3))
+    st.dataframe(rfm_df.head(3).drop(columns = 'RFM_label'))
     st.write('"RFM_label" was being assigned for each transaction by taking into consideration values of "R", "F", "M"')
-    rfm_df = rfm_labeling(rfm_df)
     st.dataframe(rfm_df.head(3))
 
     st.write('''I then performed aggregating RFM result for ploting and analyzing the difference between groups:
     ''')
-    rfm_agg = rfm_aggregation(df = rfm_df, label = 'RFM_label', agg_dict = {
-      'Recency' : 'mean',
-      'Frequency' : 'mean',
-      'Monetary' : ['mean', 'count']})
+    with profiler.stage('segment_summary', rows = len(rfm_df)):
+      rfm_summary = segment_summary(rfm_df, 'RFM_label', version = RFM_VERSION)
+    rfm_agg = rfm_aggregation(summary = rfm_summary, label = 'RFM_label')
     st.dataframe(rfm_agg)
     
     st.write('### II. RFM Result')
@@ -339,11 +263,11 @@ df_rfm = df_RFM.assign(R = r_groups.values, F = f_groups.values,  M = m_groups.v
       fig = bubble_plot(df_agg = rfm_agg, label = 'RFM_label')
       st.plotly_chart(fig)
     elif rfm_result == 'Scatter plot of customer groups':
-      scatter_fig = scatter_plot(df = rfm_df, label = 'RFM_label', palette = 'Spectral')
-      st.pyplot(scatter_fig)
+      show_png('scatter_plot', scatter_plot, data = rfm_df, version = RFM_VERSION,
+               label = 'RFM_label', palette = 'Spectral')
     elif rfm_result == 'Clusters by quantity and revenue contribution':
-      qua_re_fig = qua_rev_plot(df = rfm_df, label = 'RFM_label', palette_1 = 'Spectral', palette_2 = 'Blues')
-      st.pyplot(qua_re_fig)
+      show_png('qua_rev_plot', qua_rev_plot, data = rfm_summary, version = RFM_VERSION,
+               label = 'RFM_label', palette_1 = 'Spectral', palette_2 = 'Blues')
     st.write('Based on the result, The dataset was clustered into 4 different groups with following characteristics:')
     st.write('''    
 - Left: The data shows that this group has not made any purchases from the company for almost 1.5 years. 
@@ -363,10 +287,9 @@ elif choice == 'Kmeans Clustering':
     '---'
     st.write('### I. About The Data')
     
-    df = extract_cols(df = rfm_df, col_lst = ['Recency', 'Frequency', 'Monetary'])
+    df = extract_cols(df = 'data/RFM_data.csv', col_lst = ['Recency', 'Frequency', 'Monetary'])
     st.dataframe(df.head())
-    dis_box_fig = dis_box_plot(df = df)
-    st.pyplot(dis_box_fig)
+    show_png('dis_box_plot', dis_box_plot, data = df, version = dataset_version('data/RFM_data.csv'))
     st.write('''
   The data used for Kmeans Clustering was the original data.
   As RFM features had lots of outliners, I performed Log normalization to standardize each feature to normal distribution
@@ -397,15 +320,14 @@ def robust_scale(df):
 In order to perform Kmeans clustering, I need to determine the effective number of centroids (k). 
 By deploying Elbow method and Silhouette Score, it's clear that k = 5 centroids offer a low WSSE and not too low silhouette score.
     ''')
-    k_best_fig = k_best_plot(df=scale_df)
-    st.pyplot(k_best_fig)
+    show_png('k_best_plot', k_best_plot, data = scale_df)
     st.write('### III. Kmeans Modeling')
     st.write('''
 With the k centroids = 5, I use Kmeans() from sklearn library to conduct clusers analysis
     ''')
     st.code('''
 from sklearn.cluster import KMeans
-model = KMeans(n_clusters = 5)
+model = KMeans(n_clusters = 5, n_init = 10, random_state = 0)
 model.fit(scale_df)
 # get centroids and labels
 centroids = model.cluster_centers_
@@ -413,24 +335,25 @@ labels = model.labels_
 # assign label for original dataset
 df['K_label'] = pd.Series(labels)
     ''')
-    centroids, k_df = kmeans_model(train_df = scale_df, label_df = df)
+    centroids, k_df = kmeans_model(label_df = df)
     st.dataframe(k_df.head())
+    # labels only change with the data file or the KMeans artifact
+    k_version = (dataset_version('data/RFM_data.csv'), dataset_version(KMEANS_MODEL))
+    with profiler.stage('segment_summary', rows = len(k_df)):
+      k_summary = segment_summary(k_df, 'K_label', version = k_version)
     kmeans_result = st.radio(
       "Choose graph to observe",
       ['Bubble plot by RFM mean of each cluster', 'Scatter plot of customer groups', 'Clusters by quantity and revenue contribution'])
     if kmeans_result == 'Bubble plot by RFM mean of each cluster':
-      df_agg = df_aggregation(df = k_df, label = 'K_label', agg_dict = {
-        'Recency' : 'mean',
-        'Frequency' : 'mean',
-        'Monetary' : ['mean', 'count']})
+      df_agg = df_aggregation(summary = k_summary, label = 'K_label')
       fig_2 = bubble_plot(df_agg = df_agg, label = 'K_label')
       st.plotly_chart(fig_2)
     elif kmeans_result == 'Scatter plot of customer groups':
-      scatter_fig = scatter_plot(df = k_df, label = 'K_label', palette = 'viridis')
-      st.pyplot(scatter_fig)
+      show_png('scatter_plot', scatter_plot, data = k_df, version = k_version,
+               label = 'K_label', palette = 'viridis')
     elif kmeans_result == 'Clusters by quantity and revenue contribution':
-      qua_re_fig = qua_rev_plot(df = k_df, label = 'K_label', palette_1='crest', palette_2='flare')
-      st.pyplot(qua_re_fig.figure)
+      show_png('qua_rev_plot', qua_rev_plot, data = k_summary, version = k_version,
+               label = 'K_label', palette_1 = 'crest', palette_2 = 'flare')
     st.write('Kmeans clustering result convey 5 different clusters with following traits:')
     st.write(''' 
 - (0) and (4): These two clusters show significant differences only in recency, with (0) being nearly 2 months and (4) being nearly 1 year. 
@@ -487,9 +410,6 @@ model = DecisionTreeClassifier(criterion = 'gini',
                                min_samples_split = 2)
 model.fit(x_train, y_train)
     ''')
-    # load model
-    clf = load_model('Saved_models/DC_rmf.joblib')
-    
     # Model evaluation
     st.write('### II. Model Evaluation')
     score_option = st.radio(
@@ -550,21 +470,34 @@ model.fit(x_train, y_train)
           '---'
           st.write('#### Prediction')
           new_df = new_df_2
-          y_pred = clf.predict(new_df)
-          if y_pred == 1:
-            y = 'Left'
-          elif y_pred == 2:
-            y = 'Regular'
-          elif y_pred == 3:
-            y = 'Leaving'
-          else:
-            y = 'Loyal'
-          st.code("You belong to the " + y + " group of customer") 
+          # models are loaded on the first prediction, not when the page opens
+          tree = load_tree('Saved_models/DC_rmf_tree.npz')
+          y = label_predictions([tree.predict_row(new_df.iloc[0])])[0]
+          kmeans = load_kmeans(KMEANS_MODEL)
+          k = label_kmeans(kmeans.assign(new_df), kmeans.names)[0]
+          st.code("You belong to the " + y + " group of customer (Kmeans segment: " + k + ")") 
         else:
           '---'
           st.write('#### Prediction')
           new_df = new_df_1
+          clf = load_model('Saved_models/DC_rmf.joblib')
           y_pred = clf.predict(new_df)
-          new_df['label'] = pd.Series(y_pred)
+          new_df['label'] = label_predictions(y_pred)
+          kmeans = load_kmeans(KMEANS_MODEL)
+          new_df['kmeans_label'] = label_kmeans(kmeans.assign(new_df), kmeans.names).values
           st.dataframe(new_df.head())
 
+# ------------------------------- Diagnostics ------------------------------------------
+# per-stage timings of this run and totals since the server started; set
+# PROMETHEUS_TEXTFILE to also write the totals for node_exporter's textfile collector
+if os.environ.get('PROMETHEUS_TEXTFILE'):
+  profiler.write_textfile(os.environ['PROMETHEUS_TEXTFILE'])
+if st.sidebar.checkbox('Show diagnostics'):
+  with st.sidebar:
+    st.write('#### This run')
+    st.dataframe(profiler.table(since = run_start, session = session_id()))
+    st.write('#### All sessions since server start')
+    st.dataframe(profiler.summary())
+    st.download_button('Prometheus metrics', profiler.prometheus_text(),
+                       file_name = 'segmentation_metrics.prom', mime = 'text/plain')
+
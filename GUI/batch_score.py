@@ -0,0 +1,88 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+from joblib import load
+
+from rfm_rules import label_kmeans, label_predictions
+from tree_predictor import TreePredictor
+
+#------------------------------ Headless batch scoring ----------------------------------
+# Loads the saved classifier once, streams a csv/parquet file in chunks, predicts each
+# chunk in one vectorized call and appends the labelled chunk to the output file.
+# With a KMeans artifact the chunk also gets its KMeans segment by nearest centroid.
+MODEL_PATH = 'Saved_models/DC_rmf.joblib'
+KMEANS_PATH = 'Saved_models/kmeans_rfm.joblib'
+FEATURES = ['Recency', 'Frequency', 'Monetary']
+
+def is_parquet(path):
+  return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+def read_batches(path, chunksize = 200_000):
+  if is_parquet(path):
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(path).iter_batches(batch_size = chunksize):
+      yield batch.to_pandas()
+  else:
+    yield from pd.read_csv(path, chunksize = chunksize)
+
+
+class BatchScorer:
+  # compiled: predict with the TreePredictor built from the classifier (same results)
+  # kmeans_path: also add 'kmeans_label' from that KMeans artifact
+  def __init__(self, model_path = MODEL_PATH, compiled = True, kmeans_path = None):
+    self.clf = load(model_path)
+    self.tree = TreePredictor.from_sklearn(self.clf) if compiled else None
+    self.kmeans = None
+    if kmeans_path is not None:
+      from kmeans_artifact import KMeansArtifact
+      self.kmeans = KMeansArtifact.load(kmeans_path)
+
+  def predict(self, df):
+    if self.tree is not None:
+      return self.tree.predict(df[FEATURES])
+    return self.clf.predict(df[FEATURES])
+
+  def score(self, df):
+    scored = df.assign(label = label_predictions(self.predict(df)))
+    if self.kmeans is not None:
+      scored['kmeans_label'] = label_kmeans(self.kmeans.assign(df), self.kmeans.names).values
+    return scored
+
+  # returns (rows, seconds)
+  def score_file(self, input_path, output_path, chunksize = 200_000):
+    writer = None
+    rows = 0
+    start = time.perf_counter()
+    try:
+      for chunk in read_batches(input_path, chunksize):
+        scored = self.score(chunk)
+        if is_parquet(output_path):
+          import pyarrow as pa
+          import pyarrow.parquet as pq
+          table = pa.Table.from_pandas(scored, preserve_index = False)
+          if writer is None:
+            writer = pq.ParquetWriter(output_path, table.schema)
+          writer.write_table(table)
+        else:
+          scored.to_csv(output_path, mode = 'w' if rows == 0 else 'a', header = rows == 0, index = False)
+        rows += len(scored)
+    finally:
+      if writer is not None:
+        writer.close()
+    return rows, time.perf_counter() - start
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Label customers with the saved RFM classifier')
+  parser.add_argument('input', help = 'csv or parquet with Recency, Frequency and Monetary columns')
+  parser.add_argument('output', help = 'csv or parquet to write, input columns plus "label"')
+  parser.add_argument('--model', default = MODEL_PATH)
+  parser.add_argument('--chunksize', type = int, default = 200_000)
+  parser.add_argument('--sklearn', action = 'store_true', help = 'use clf.predict instead of the compiled tree')
+  parser.add_argument('--kmeans', nargs = '?', const = KMEANS_PATH, help = 'also add "kmeans_label" from this KMeans artifact')
+  args = parser.parse_args()
+
+  scorer = BatchScorer(args.model, compiled = not args.sklearn, kmeans_path = args.kmeans)
+  rows, seconds = scorer.score_file(args.input, args.output, chunksize = args.chunksize)
+  print(f'{rows} rows scored in {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} rows/sec)')
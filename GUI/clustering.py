@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+#------------------------------ Clustering backends -------------------------------------
+# 'kmeans' fits full-batch KMeans on an in-memory array. 'minibatch' feeds
+# MiniBatchKMeans.partial_fit from a chunk iterator, so only one chunk is in memory at a
+# time. Passing a seed fixes the initialisation and therefore the cluster ids.
+BACKENDS = ('kmeans', 'minibatch')
+
+def iter_chunks(data, chunksize = 100_000):
+  data = np.asarray(data)
+  for start in range(0, len(data), chunksize):
+    yield data[start:start + chunksize]
+
+# chunks of selected numeric columns from a csv, e.g. scaled RFM rows
+def read_chunks(path, columns, chunksize = 100_000, dtype = np.float32):
+  for chunk in pd.read_csv(path, usecols = columns, chunksize = chunksize):
+    yield chunk[columns].to_numpy(dtype = dtype)
+
+
+class ClusteringBackend:
+  def __init__(self, backend = 'kmeans', n_clusters = 5, seed = None, batch_size = 4096, n_epochs = 1):
+    if backend not in BACKENDS:
+      raise ValueError(f'backend must be one of {BACKENDS}')
+    self.backend = backend
+    self.n_clusters = n_clusters
+    self.seed = seed
+    self.batch_size = batch_size
+    self.n_epochs = n_epochs
+    self.model = None
+
+  # data: an array, or for 'minibatch' a callable returning a fresh chunk iterator
+  # (called once per epoch)
+  def fit(self, data):
+    if self.backend == 'kmeans':
+      self.model = KMeans(n_clusters = self.n_clusters, n_init = 10, random_state = self.seed)
+      self.model.fit(np.asarray(data))
+      return self
+    chunks = data if callable(data) else (lambda: iter_chunks(data, self.batch_size * 25))
+    self.model = MiniBatchKMeans(n_clusters = self.n_clusters, batch_size = self.batch_size,
+                                 n_init = 3, random_state = self.seed)
+    for _ in range(self.n_epochs):
+      for chunk in chunks():
+        for batch in iter_chunks(chunk, self.batch_size):
+          # the first call also picks the initial centroids, it needs enough rows
+          if not hasattr(self.model, 'cluster_centers_') and len(batch) < self.n_clusters * 3:
+            continue
+          self.model.partial_fit(batch)
+    return self
+
+  @property
+  def cluster_centers_(self):
+    return self.model.cluster_centers_
+
+  # sklearn requires predict data to have the dtype the centroids were fitted with
+  def _chunks(self, data):
+    if isinstance(data, (np.ndarray, pd.DataFrame)):
+      data = iter_chunks(data)
+    dtype = self.model.cluster_centers_.dtype
+    return (np.asarray(chunk, dtype = dtype) for chunk in data)
+
+  def predict(self, data):
+    return np.concatenate([self.model.predict(chunk) for chunk in self._chunks(data)])
+
+  # sum of squared distances to the closest centroid, computed chunk by chunk
+  def inertia(self, data):
+    return sum(-self.model.score(chunk) for chunk in self._chunks(data))
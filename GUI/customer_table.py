@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from rfm_rules import rfm_rules
+from storage import load_df
+
+#------------------------------ Compact customer table ----------------------------------
+# The app keeps one customer table per data file, shared by every session
+# (st.cache_resource) and never modified once built: int32 Recency/Frequency, float32
+# Monetary, uint8 R/F/M scores and a categorical RFM_label (one byte per customer
+# instead of a python string). Pages take column views of it rather than copies, so
+# the value and score arrays are read-only: an in-place write raises instead of
+# changing the data of every session.
+VALUE_DTYPES = {'Recency' : np.int32, 'Frequency' : np.int32, 'Monetary' : np.float32}
+SCORE_COLS = ['R', 'F', 'M']
+
+def compact_rfm(df):
+  cols = {}
+  for col in df.columns:
+    if col in VALUE_DTYPES or col in SCORE_COLS:
+      values = df[col].to_numpy(dtype = VALUE_DTYPES.get(col, np.uint8), copy = True)
+      values.flags.writeable = False
+      cols[col] = values
+    else:
+      cols[col] = df[col]
+  # copy = False keeps one block per column, so column views never copy
+  return pd.DataFrame(cols, index = df.index, copy = False)
+
+# categories are sorted, the order pd.factorize(sort = True) gives string labels, so
+# summaries and plot legends come out as with the object column
+def categorical_labels(codes, names):
+  names = np.asarray(names, dtype = object)
+  order = np.argsort(names, kind = 'stable')
+  rank = np.empty(len(names), dtype = np.int8)
+  rank[order] = np.arange(len(names))
+  return pd.Categorical.from_codes(rank[np.asarray(codes)], categories = names[order])
+
+def rfm_labels(df):
+  return pd.Series(categorical_labels(rfm_rules.codes(df), rfm_rules.names), index = df.index)
+
+def load_customers(path):
+  df = compact_rfm(load_df(path))
+  if set(SCORE_COLS) <= set(df.columns):
+    df['RFM_label'] = rfm_labels(df)
+  return df
+
+# frames sharing the column arrays of df
+def columns_view(df, columns):
+  return pd.DataFrame({col : df[col] for col in columns}, copy = False)
+
+# pd.concat would consolidate same-dtype columns into a new block, i.e. copy them
+def with_column(df, name, values):
+  cols = {col : df[col] for col in df.columns}
+  cols[name] = pd.Series(values, index = df.index)
+  return pd.DataFrame(cols, copy = False)
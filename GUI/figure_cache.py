@@ -0,0 +1,118 @@
+import hashlib
+import io
+import os
+import tempfile
+import time
+from collections import deque
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+#------------------------------ Rendered figure cache -----------------------------------
+# Figures are stored as PNG bytes on disk under a key made of the plot name, a cheap
+# fingerprint of the input frame (or a dataset version id) and the plot parameters.
+# A hit reads the file and never touches the DataFrame or unpickles a Figure.
+# Files are evicted least recently used first once the directory exceeds max_bytes.
+# Keys also hold CACHE_FORMAT and a code version (e.g. code_version of the plotting
+# modules), so PNGs drawn by an older plot implementation are not served after a deploy.
+CACHE_DIR = '.cache/figures'
+CACHE_FORMAT = 2
+SAMPLE_ROWS = 4096
+MAX_TIMINGS = 1000
+
+# shape, dtypes, per-column sums of numeric columns and a hash of a strided row sample
+def frame_fingerprint(df):
+  digest = hashlib.sha1()
+  digest.update(repr((df.shape, list(df.columns), [str(t) for t in df.dtypes])).encode())
+  numeric = df.select_dtypes(include = 'number')
+  if numeric.shape[1]:
+    digest.update(numeric.to_numpy(dtype = np.float64).sum(axis = 0).tobytes())
+  step = max(1, len(df) // SAMPLE_ROWS)
+  digest.update(pd.util.hash_pandas_object(df.iloc[::step], index = False).values.tobytes())
+  return digest.hexdigest()
+
+# content hash of the source files that draw the figures
+def code_version(*paths):
+  digest = hashlib.sha1()
+  for path in paths:
+    with open(path, 'rb') as f:
+      digest.update(f.read())
+  return digest.hexdigest()
+
+
+class FigureCache:
+  def __init__(self, cache_dir = CACHE_DIR, max_bytes = 200 * 2**20, dpi = 200, code_version = None):
+    self.cache_dir = cache_dir
+    self.max_bytes = max_bytes
+    self.dpi = dpi
+    self.code_version = code_version
+    # recent (plot, 'hit'/'miss', seconds), bounded since the cache lives as long as the server
+    self.timings = deque(maxlen = MAX_TIMINGS)
+    os.makedirs(cache_dir, exist_ok = True)
+
+  def key(self, name, data = None, version = None, **params):
+    source = version if version is not None else frame_fingerprint(data) if data is not None else None
+    return hashlib.sha1(repr((CACHE_FORMAT, self.code_version, self.dpi, name, source,
+                              sorted(params.items()))).encode()).hexdigest()
+
+  # PNG bytes of render(data, **params), rendered only on a miss
+  def png(self, name, render, data = None, version = None, **params):
+    return self.fetch(name, render, data, version, **params)[0]
+
+  # (PNG bytes, True on a cache hit)
+  def fetch(self, name, render, data = None, version = None, **params):
+    start = time.perf_counter()
+    path = os.path.join(self.cache_dir, self.key(name, data, version, **params) + '.png')
+    try:
+      with open(path, 'rb') as f:
+        png = f.read()
+      os.utime(path)
+      self.timings.append((name, 'hit', time.perf_counter() - start))
+      return png, True
+    except FileNotFoundError:
+      # not cached, or evicted by another session meanwhile
+      pass
+    fig = render(data, **params)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format = 'png', dpi = self.dpi, bbox_inches = 'tight')
+    plt.close(fig)
+    png = buffer.getvalue()
+    # sessions are threads of one process: each write gets its own temp file
+    fd, tmp = tempfile.mkstemp(dir = self.cache_dir, suffix = '.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        f.write(png)
+      os.replace(tmp, path)
+    except BaseException:
+      os.unlink(tmp)
+      raise
+    self.evict()
+    self.timings.append((name, 'miss', time.perf_counter() - start))
+    return png, False
+
+  # other sessions may evict (or be writing) the same files concurrently
+  def evict(self):
+    stats = []
+    for f in os.listdir(self.cache_dir):
+      if not f.endswith('.png'):
+        continue
+      path = os.path.join(self.cache_dir, f)
+      try:
+        stat = os.stat(path)
+      except FileNotFoundError:
+        continue
+      stats.append((stat.st_mtime, stat.st_size, path))
+    stats.sort()
+    total = sum(size for _, size, _ in stats)
+    for _, size, path in stats:
+      if total <= self.max_bytes:
+        break
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+      total -= size
+
+  def stats(self):
+    return pd.DataFrame(list(self.timings), columns = ['Plot', 'Result', 'Seconds'])
@@ -0,0 +1,172 @@
+import functools
+import json
+import logging
+import os
+import resource
+import tempfile
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+#------------------------------ Per-stage instrumentation -------------------------------
+# Each record holds stage name, duration, cache hit/miss (None when unknown), input rows,
+# the change in resident memory and the session it ran for (set per script thread with
+# set_session). Records are kept in a bounded deque for the app's diagnostics panel,
+# totals per stage are kept for Prometheus text output, and every record is logged as
+# one JSON line on the 'segmentation.profile' logger.
+logger = logging.getLogger('segmentation.profile')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# current resident set size; peak RSS where /proc is not available
+def rss_bytes():
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * PAGE_SIZE
+  except OSError:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def rows_of(*values):
+  for value in values:
+    if isinstance(value, (pd.DataFrame, pd.Series)) or hasattr(value, 'shape'):
+      return len(value)
+  return None
+
+
+class Stage:
+  def __init__(self, name, rows = None, hit = None):
+    self.name = name
+    self.rows = rows
+    self.hit = hit
+
+
+class Profiler:
+  def __init__(self, max_records = 2000):
+    self.records = deque(maxlen = max_records)
+    self.totals = {}
+    self.seq = 0
+    self._lock = threading.Lock()
+    self._local = threading.local()
+
+  # records made by the current thread are tagged with session until the next call
+  def set_session(self, session):
+    self._local.session = session
+
+  # with profiler.stage('name', rows = len(df)) as stage: ...; stage.hit = True
+  def stage(self, name, rows = None, hit = None):
+    return _StageContext(self, Stage(name, rows, hit))
+
+  def record(self, stage, seconds, memory_delta):
+    with self._lock:
+      self.seq += 1
+      record = {'seq' : self.seq, 'time' : time.time(), 'session' : getattr(self._local, 'session', None),
+                'stage' : stage.name,
+                'seconds' : round(seconds, 6), 'cache' : None if stage.hit is None else 'hit' if stage.hit else 'miss',
+                'rows' : stage.rows, 'memory_delta_bytes' : memory_delta}
+      self.records.append(record)
+      total = self.totals.setdefault(stage.name, {'calls' : {}, 'seconds' : 0.0, 'rows' : 0, 'memory_delta_bytes' : 0})
+      key = record['cache'] or 'none'
+      total['calls'][key] = total['calls'].get(key, 0) + 1
+      total['seconds'] += seconds
+      total['rows'] += stage.rows or 0
+      total['memory_delta_bytes'] += memory_delta
+    logger.info(json.dumps(record))
+    return record
+
+  # wraps a streamlit cache decorator (st.cache_data, st.cache_resource):
+  # the function body only runs on a miss, which is how hits are told apart
+  def cached(self, cache, name = None):
+    def decorate(func):
+      label = name or func.__name__
+      @functools.wraps(func)
+      def run(*args, **kwargs):
+        self._local.ran[-1] = True
+        return func(*args, **kwargs)
+      cached_func = cache(run)
+      @functools.wraps(func)
+      def call(*args, **kwargs):
+        if not hasattr(self._local, 'ran'):
+          self._local.ran = []
+        with self.stage(label, rows_of(*args, *kwargs.values())) as stage:
+          self._local.ran.append(False)
+          try:
+            result = cached_func(*args, **kwargs)
+          finally:
+            stage.hit = not self._local.ran.pop()
+          if stage.rows is None:
+            stage.rows = rows_of(result)
+        return result
+      return call
+    return decorate
+
+  # plain timing decorator for functions without a cache
+  def timed(self, func = None, name = None):
+    if func is None:
+      return functools.partial(self.timed, name = name)
+    label = name or func.__name__
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+      with self.stage(label, rows_of(*args, *kwargs.values())):
+        return func(*args, **kwargs)
+    return call
+
+  # records after seq since; only those of session when one is given
+  def table(self, since = 0, session = None):
+    return pd.DataFrame([r for r in self.records if r['seq'] > since and (session is None or r['session'] == session)],
+                        columns = ['seq', 'stage', 'seconds', 'cache', 'rows', 'memory_delta_bytes'])
+
+  def summary(self):
+    rows = []
+    for name, total in self.totals.items():
+      calls = sum(total['calls'].values())
+      rows.append({'stage' : name, 'calls' : calls, 'hits' : total['calls'].get('hit', 0),
+                   'misses' : total['calls'].get('miss', 0), 'seconds' : round(total['seconds'], 4),
+                   'mean_ms' : round(total['seconds'] * 1000 / calls, 2), 'rows' : total['rows'],
+                   'memory_delta_mb' : round(total['memory_delta_bytes'] / 2**20, 2)})
+    return pd.DataFrame(rows, columns = ['stage', 'calls', 'hits', 'misses', 'seconds', 'mean_ms', 'rows', 'memory_delta_mb'])
+
+  # Prometheus text exposition format
+  def prometheus_text(self, prefix = 'segmentation_stage'):
+    lines = [f'# HELP {prefix}_calls_total Calls per stage and cache result.', f'# TYPE {prefix}_calls_total counter']
+    for name, total in sorted(self.totals.items()):
+      for cache, count in sorted(total['calls'].items()):
+        lines.append(f'{prefix}_calls_total{{stage="{name}",cache="{cache}"}} {count}')
+    # RSS deltas can be negative, so their sum is a gauge rather than a counter
+    for metric, key, kind, help_text in [('seconds_total', 'seconds', 'counter', 'Time spent per stage.'),
+                                         ('rows_total', 'rows', 'counter', 'Input rows processed per stage.'),
+                                         ('memory_delta_bytes', 'memory_delta_bytes', 'gauge', 'Sum of resident memory changes per stage.')]:
+      lines += [f'# HELP {prefix}_{metric} {help_text}', f'# TYPE {prefix}_{metric} {kind}']
+      for name, total in sorted(self.totals.items()):
+        lines.append(f'{prefix}_{metric}{{stage="{name}"}} {total[key]}')
+    return '\n'.join(lines) + '\n'
+
+  # for node_exporter's textfile collector; written atomically through a temp file of
+  # its own, since every session's rerun may call this concurrently
+  def write_textfile(self, path):
+    # totals are snapshotted under the lock, other sessions keep recording meanwhile
+    with self._lock:
+      text = self.prometheus_text()
+    fd, tmp = tempfile.mkstemp(dir = os.path.dirname(os.path.abspath(path)), suffix = '.tmp')
+    try:
+      with os.fdopen(fd, 'w') as f:
+        f.write(text)
+      os.replace(tmp, path)
+    except BaseException:
+      os.unlink(tmp)
+      raise
+
+
+class _StageContext:
+  def __init__(self, profiler, stage):
+    self.profiler = profiler
+    self.stage = stage
+
+  def __enter__(self):
+    self.memory = rss_bytes()
+    self.start = time.perf_counter()
+    return self.stage
+
+  def __exit__(self, *exc):
+    self.profiler.record(self.stage, time.perf_counter() - self.start, rss_bytes() - self.memory)
+    return False
@@ -0,0 +1,86 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from joblib import dump, load
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+from threadpoolctl import threadpool_limits
+
+#------------------------------ K-selection sweep ---------------------------------------
+# Fits one KMeans per k in a process pool. The scaled data is sent to each worker once
+# (pool initializer) instead of once per k, and silhouette is computed either on a
+# stratified sample, with the O(n*k) centroid-based simplified silhouette, or exactly.
+CACHE_DIR = '.cache/k_sweep'
+SILHOUETTE_MODES = ('sample', 'simplified', 'full')
+
+_data = None
+
+def _init_worker(data):
+  global _data
+  _data = data
+
+def stratified_sample(labels, size, seed = 0):
+  rng = np.random.default_rng(seed)
+  if size >= len(labels):
+    return np.arange(len(labels))
+  idx = []
+  clusters, counts = np.unique(labels, return_counts = True)
+  for cluster, count in zip(clusters, counts):
+    members = np.flatnonzero(labels == cluster)
+    take = max(1, int(round(size * count / len(labels))))
+    idx.append(rng.choice(members, size = min(take, count), replace = False))
+  return np.sort(np.concatenate(idx))
+
+def simplified_silhouette(data, labels, centroids):
+  dist = np.empty((len(data), len(centroids)))
+  for j, centroid in enumerate(centroids):
+    dist[:, j] = np.sqrt(((data - centroid) ** 2).sum(axis = 1))
+  a = dist[np.arange(len(data)), labels]
+  dist[np.arange(len(data)), labels] = np.inf
+  b = dist.min(axis = 1)
+  denom = np.maximum(a, b)
+  s = np.divide(b - a, denom, out = np.zeros_like(a), where = denom > 0)
+  return s.mean()
+
+def _fit_k(k, seed, silhouette, sample_size):
+  data = _data
+  with threadpool_limits(1):
+    kmeans = KMeans(n_clusters = k, n_init = 10, random_state = seed)
+    kmeans.fit(data)
+  labels = kmeans.labels_
+  if silhouette == 'simplified':
+    score = simplified_silhouette(data, labels, kmeans.cluster_centers_)
+  elif silhouette == 'sample':
+    idx = stratified_sample(labels, sample_size, seed)
+    score = silhouette_score(data[idx], labels[idx])
+  else:
+    score = silhouette_score(data, labels)
+  return {'K' : k, 'WSSE' : kmeans.inertia_ / data.shape[0], 'Silhouette' : score}
+
+def data_hash(data):
+  data = np.ascontiguousarray(data)
+  return hashlib.sha1(data.tobytes() + str(data.shape).encode()).hexdigest()
+
+def sweep_k(df, k_values = range(2, 10), seed = 0, silhouette = 'sample', sample_size = 5000,
+            n_jobs = None, cache_dir = CACHE_DIR):
+  if silhouette not in SILHOUETTE_MODES:
+    raise ValueError(f'silhouette must be one of {SILHOUETTE_MODES}')
+  data = np.asarray(df, dtype = np.float64)
+  k_values = list(k_values)
+  key = hashlib.sha1(repr((data_hash(data), k_values, seed, silhouette, sample_size)).encode()).hexdigest()
+  cache_file = os.path.join(cache_dir, key + '.joblib') if cache_dir else None
+  if cache_file and os.path.exists(cache_file):
+    return load(cache_file)
+
+  n_jobs = n_jobs or min(len(k_values), os.cpu_count() or 1)
+  with ProcessPoolExecutor(max_workers = n_jobs, initializer = _init_worker, initargs = (data,)) as pool:
+    futures = [pool.submit(_fit_k, k, seed, silhouette, sample_size) for k in k_values]
+    scores = pd.DataFrame([f.result() for f in futures])
+
+  if cache_file:
+    os.makedirs(cache_dir, exist_ok = True)
+    dump(scores, cache_file)
+  return scores
@@ -0,0 +1,149 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import dump, load
+
+from clustering import ClusteringBackend
+from rfm_rules import K_DEFAULT, K_LABELS
+from rfm_scaler import FEATURES, LogRobustScaler
+from segment_summary import fingerprint
+
+#------------------------------ Offline KMeans artifact ---------------------------------
+# KMeans is trained once with a fixed seed on log1p + robust scaled RFM values and saved
+# with its fitted scaler (rfm_scaler.py), so the app only transforms and predicts.
+# Cluster ids are not left to the fit: they are assigned from the centroids so that
+# K_LABELS always names the same kind of customer
+# - Star: best (frequency + monetary - recency)
+# - Potential: best (frequency + monetary) of the rest
+# - Left: longest recency of the rest
+# - the remaining clusters are Regular, taking the other ids by increasing recency
+# New customers are assigned with assign(): scale a chunk, one (rows x clusters) distance
+# matrix against the centroids, argmin. Memory stays bounded by the chunk size.
+ARTIFACT_VERSION = 2
+MODEL_PATH = 'Saved_models/kmeans_rfm.joblib'
+ASSIGN_ROWS = 65_536
+
+# new id of each fitted cluster, from scaled centroids (columns in FEATURES order)
+def canonical_ids(centers):
+  r, f, m = centers[:, 0], centers[:, 1], centers[:, 2]
+  ids = dict((name, code) for code, name in K_LABELS.items())
+  if len(centers) < len(ids) + 1 or max(K_LABELS) >= len(centers):
+    raise ValueError(f'need at least {max(max(K_LABELS) + 1, len(ids) + 1)} clusters to name them')
+  rest = list(range(len(centers)))
+  order = {}
+  for name, score in [('Star', f + m - r), ('Potential', f + m), ('Left', r)]:
+    best = max(rest, key = lambda i: score[i])
+    order[best] = ids[name]
+    rest.remove(best)
+  free = [code for code in range(len(centers)) if code not in K_LABELS]
+  for old, new in zip(sorted(rest, key = lambda i: r[i]), free):
+    order[old] = new
+  return np.array([order[i] for i in range(len(centers))])
+
+
+class KMeansArtifact:
+  def __init__(self, model, scaler, seed, data_fingerprint, profile):
+    self.version = ARTIFACT_VERSION
+    self.model = model
+    self.scaler = scaler
+    self.seed = seed
+    self.data_fingerprint = data_fingerprint
+    self.profile = profile
+    self.names = dict((code, K_LABELS.get(code, K_DEFAULT)) for code in range(len(model.cluster_centers_)))
+    self.sklearn_version = sklearn.__version__
+
+  @classmethod
+  def train(cls, df, n_clusters = 5, seed = 0, backend = 'kmeans'):
+    scaler = LogRobustScaler()
+    X = scaler.fit_transform(df)
+    model = ClusteringBackend(backend = backend, n_clusters = n_clusters, seed = seed).fit(X).model
+    new_ids = canonical_ids(model.cluster_centers_)
+    centers = np.empty_like(model.cluster_centers_)
+    centers[new_ids] = model.cluster_centers_
+    model.cluster_centers_ = centers
+    if hasattr(model, 'labels_'):
+      model.labels_ = new_ids[model.labels_].astype(model.labels_.dtype)
+    labels = model.predict(X)
+    profile = pd.DataFrame(df[FEATURES]).groupby(labels).mean().round(1)
+    profile['Count'] = np.bincount(labels, minlength = n_clusters)
+    artifact = cls(model, scaler, seed, fingerprint(np.asarray(df[FEATURES], dtype = np.float64)), profile)
+    artifact.profile.insert(0, 'Name', [artifact.names[code] for code in profile.index])
+    return artifact
+
+  @classmethod
+  def load(cls, path = MODEL_PATH):
+    state = load(path)
+    if state.get('version') != ARTIFACT_VERSION:
+      raise ValueError(f'{path} has artifact version {state.get("version")}, expected {ARTIFACT_VERSION}; '
+                       'retrain it with python GUI/kmeans_artifact.py')
+    artifact = cls.__new__(cls)
+    artifact.__dict__.update(state)
+    return artifact
+
+  def save(self, path = MODEL_PATH):
+    dump(self.__dict__, path)
+
+  @property
+  def centroids(self):
+    return self.model.cluster_centers_
+
+  def transform(self, df, copy = True):
+    return self.scaler.transform(df, copy)
+
+  def predict(self, df):
+    return self.model.predict(self.transform(df).astype(self.centroids.dtype, copy = False))
+
+  # nearest centroid per row, same ids as predict(). |x - c|^2 = |x|^2 - 2 x.c + |c|^2
+  # and |x|^2 does not change the argmin, so a chunk costs one small matrix product.
+  # Chunks are laid out column-major ((features, rows) and (clusters, rows)) in reused
+  # float32 buffers: the running minimum over clusters then works on contiguous rows,
+  # and memory does not grow with the input
+  def assign(self, data, chunksize = ASSIGN_ROWS):
+    columns = self.scaler.columns
+    if isinstance(data, pd.DataFrame):
+      data = [data[col].to_numpy() for col in columns]
+    else:
+      data = [np.asarray(data)[:, j] for j in range(len(columns))]
+    centers = self.centroids.astype(np.float32)
+    half_norms = 0.5 * (centers ** 2).sum(axis = 1, keepdims = True)
+    n = len(data[0])
+    labels = np.empty(n, dtype = np.int32)
+    size = min(chunksize, n)
+    XT = np.empty((len(columns), size), dtype = np.float32)
+    distances = np.empty((len(centers), size), dtype = np.float32)
+    best = np.empty(size, dtype = np.float32)
+    closer = np.empty(size, dtype = bool)
+    for start in range(0, n, chunksize):
+      rows = min(chunksize, n - start)
+      for j, col in enumerate(data):
+        XT[j, :rows] = col[start:start + rows]
+      self.scaler.transform(XT[:, :rows].T, copy = False)
+      d = distances[:, :rows]
+      np.matmul(centers, XT[:, :rows], out = d)
+      np.subtract(half_norms, d, out = d)
+      out = labels[start:start + rows]
+      out[:] = 0
+      best[:rows] = d[0]
+      # strict < keeps the first of equally close centroids, like argmin
+      for k in range(1, len(centers)):
+        np.less(d[k], best[:rows], out = closer[:rows])
+        np.minimum(d[k], best[:rows], out = best[:rows])
+        np.putmask(out, closer[:rows], k)
+    return labels
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Train the KMeans segmentation artifact')
+  parser.add_argument('data', nargs = '?', default = 'data/RFM_data.csv')
+  parser.add_argument('output', nargs = '?', default = MODEL_PATH)
+  parser.add_argument('--n-clusters', type = int, default = 5)
+  parser.add_argument('--seed', type = int, default = 0)
+  parser.add_argument('--backend', default = 'kmeans', choices = ['kmeans', 'minibatch'])
+  args = parser.parse_args()
+
+  df = pd.read_csv(args.data, usecols = FEATURES)
+  artifact = KMeansArtifact.train(df, n_clusters = args.n_clusters, seed = args.seed, backend = args.backend)
+  artifact.save(args.output)
+  print(artifact.profile.to_string())
+  print(f'saved to {args.output} (seed {args.seed}, data {artifact.data_fingerprint[:12]})')
@@ -0,0 +1,91 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.patches import Patch
+
+#------------------------------ Large-data scatter rendering ----------------------------
+# Two ways to keep scatter plots cheap whatever the number of customers:
+# - a fixed budget of points sampled per segment (small segments keep a minimum share)
+# - a density raster: one 2D histogram per segment in a single bincount pass, drawn as
+#   an image whose colour mixes the segment colours and whose opacity follows log counts
+
+def sample_per_segment(df, label, budget = 10_000, seed = 0):
+  if len(df) <= budget:
+    return df
+  codes, segments = pd.factorize(df[label], sort = True)
+  counts = np.bincount(codes, minlength = len(segments))
+  floor = budget // (4 * len(segments))
+  quota = np.minimum(counts, np.maximum(np.round(budget * counts / counts.sum()).astype(int), floor))
+  rng = np.random.default_rng(seed)
+  order = np.argsort(codes, kind = 'stable')
+  starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+  idx = [order[start + rng.choice(count, take, replace = False)]
+         for start, count, take in zip(starts, counts, quota) if take]
+  return df.iloc[np.sort(np.concatenate(idx))]
+
+# a constant column has no width to bin over, so it gets a unit-wide range around it
+def widen(lo, hi):
+  return (lo - 0.5, hi + 0.5) if hi <= lo else (lo, hi)
+
+# counts[segment, y bin, x bin]; rows are binned in chunks to bound temporary memory
+def segment_density(x, y, codes, n_segments, bins, x_range, y_range, chunksize = 1_000_000):
+  x_range, y_range = widen(*x_range), widen(*y_range)
+  counts = np.zeros(n_segments * bins[0] * bins[1], dtype = np.int64)
+  for start in range(0, len(codes), chunksize):
+    cx = np.asarray(x[start:start + chunksize], dtype = np.float64)
+    cy = np.asarray(y[start:start + chunksize], dtype = np.float64)
+    inside = (cx >= x_range[0]) & (cx <= x_range[1]) & (cy >= y_range[0]) & (cy <= y_range[1])
+    xi = np.minimum(((cx[inside] - x_range[0]) / (x_range[1] - x_range[0]) * bins[0]).astype(np.intp), bins[0] - 1)
+    yi = np.minimum(((cy[inside] - y_range[0]) / (y_range[1] - y_range[0]) * bins[1]).astype(np.intp), bins[1] - 1)
+    flat = (codes[start:start + chunksize][inside] * bins[1] + yi) * bins[0] + xi
+    counts += np.bincount(flat, minlength = len(counts))
+  return counts.reshape(n_segments, bins[1], bins[0])
+
+def density_image(counts, colors):
+  total = counts.sum(axis = 0)
+  rgb = np.tensordot(counts, np.asarray(colors)[:, :3], axes = (0, 0))
+  rgb = rgb / np.maximum(total, 1)[..., None]
+  # any occupied pixel stays visible, denser ones get more opaque
+  alpha = np.where(total > 0, 0.35 + 0.65 * np.log1p(total) / np.log1p(max(total.max(), 1)), 0)
+  return np.dstack([rgb, alpha])
+
+def density_plot(ax, df, x, y, label, palette, bins = (300, 200), x_range = None, y_range = None):
+  codes, segments = pd.factorize(df[label], sort = True)
+  x_range = widen(*(x_range or (float(df[x].min()), float(df[x].max()))))
+  y_range = widen(*(y_range or (float(df[y].min()), float(df[y].max()))))
+  colors = sns.color_palette(palette, len(segments))
+  counts = segment_density(df[x].values, df[y].values, codes, len(segments), bins, x_range, y_range)
+  ax.imshow(density_image(counts, colors), origin = 'lower', aspect = 'auto', interpolation = 'nearest',
+            extent = (x_range[0], x_range[1], y_range[0], y_range[1]))
+  ax.legend(handles = [Patch(color = c, label = str(s)) for s, c in zip(segments, colors)], title = label)
+  return ax
+
+# Recency against Frequency and Monetary, coloured by segment. mode 'auto' draws every
+# point up to `budget` customers, a per-segment sample of `budget` points up to
+# DENSITY_ROWS, and a density raster beyond
+DENSITY_ROWS = 1_000_000
+
+def segment_scatter(df, label, palette = 'Spectral', mode = 'auto', budget = 10_000):
+  if mode == 'auto':
+    mode = 'full' if len(df) <= budget else 'sample' if len(df) <= DENSITY_ROWS else 'density'
+  if mode == 'sample':
+    df = sample_per_segment(df, label, budget = budget)
+  scatter_fig = plt.figure(figsize = (11, 5))
+  ax = plt.subplot(1,2,1)
+  if mode == 'density':
+    density_plot(ax, df, 'Frequency', 'Recency', label, palette)
+  else:
+    sns.scatterplot(data = df, x = 'Frequency', y = 'Recency', hue = label, palette = palette)
+  plt.ylabel('Recency', fontsize = 12)
+  plt.xlabel('Frequency', fontsize = 12)
+  ax = plt.subplot(1,2,2)
+  if mode == 'density':
+    density_plot(ax, df, 'Monetary', 'Recency', label, palette, x_range = (0, 3000))
+  else:
+    sns.scatterplot(data = df, x = 'Monetary', y = 'Recency', hue = label, palette = palette)
+  plt.xlim([0, 3000])
+  plt.ylabel(None)
+  plt.xlabel('Monetary Value', fontsize = 12)
+  plt.tight_layout()
+  return scatter_fig
@@ -0,0 +1,95 @@
+#------------------------------ Figures of the app -------------------------------------
+# Plot builders used by CustomerSegmentation_GUI.py, kept out of the streamlit script so
+# they can be benchmarked (benchmarks/run_benchmarks.py). Libraries are imported inside
+# each function: a page that never draws a matplotlib figure never imports matplotlib.
+
+# Clusters bubble plot
+def bubble_plot(df_agg, label):
+  import plotly.express as px
+  fig = px.scatter(df_agg, x="RecencyMean", y="FrequencyMean", size="MonetaryMean", color=label,
+                  hover_name=label, size_max=100)
+  return fig
+
+# clusters by quantity
+def qua_rev_plot(summary, label, palette_1, palette_2):
+  import matplotlib.pyplot as plt
+  import seaborn as sns
+  count = summary.set_index(label)['Percent'].sort_values(ascending = False)
+  sum = summary.set_index(label)[['RevenuePercent']].round(2)
+  sum = sum.rename(columns = {'RevenuePercent' : 'percent'}).sort_values(by='percent')
+
+  plt.style.use('seaborn-whitegrid')
+  qua_re_fig = plt.figure(figsize = (10, 5))
+  plt.subplot(1,2,1)
+  ax_q = sns.barplot(data = count, 
+              x = count.index.tolist(), y = count.values,
+              orient = 'h',
+              palette = palette_1)
+  ytick = [str(x) for x in count.index.tolist()]
+  ax_q.set_yticklabels(ytick, fontsize=13)
+  plt.setp(ax_q.get_xticklabels(), fontsize = 13)
+  ax_q.set_title("Customers' count by each cluster (%)", fontsize=17)
+  ax_q.set_ylabel('Labels', fontsize = 15)
+  ax_q.set_xlabel(None)
+  # clusters by revenues
+  plt.subplot(1,2,2)
+  ax_r = sns.barplot(y = sum.index, 
+              x=sum.percent, 
+              palette = palette_2, orient='h')
+  ytick = [str(x) for x in sum.index.values.tolist()]
+  ax_r.set_yticklabels(ytick, fontsize = 13)
+  ax_r.set_xlim(0, 60)
+  ax_r.set_ylabel(None)
+  ax_r.set_xlabel(None)
+  ax_r.set_title('Total revenue by customer clusters (%)', fontsize = 17)
+  plt.setp(ax_r.get_xticklabels(), fontsize=13)
+  plt.tight_layout()
+  return qua_re_fig
+
+# distribution and boxplot
+def dis_box_plot(df):
+  import matplotlib.pyplot as plt
+  import seaborn as sns
+  dis_box_fig = plt.figure(figsize=(10,8))
+  plt.subplot(3, 2, 1)
+  sns.distplot(df['Recency'], color = 'c')
+  plt.subplot(3, 2, 3)
+  sns.distplot(df['Frequency'], color = 'c')
+  plt.subplot(3, 2, 5)
+  sns.distplot(df['Monetary'], color = 'c') 
+  plt.subplot(3, 2, 2)
+  sns.boxplot(df.Recency, color = 'c', orient = 'h')
+  plt.xlabel('Recency')
+  plt.subplot(3, 2, 4)
+  sns.boxplot(df.Frequency, color = 'c', orient = 'h')
+  plt.xlabel('Frequency')
+  plt.subplot(3, 2, 6)
+  sns.boxplot(df.Monetary, color = 'c', orient = 'h')
+  plt.xlabel('Monetary Value')
+  plt.tight_layout()
+  return dis_box_fig
+
+# Picking best centroids with Elbow method
+def k_best_plot(df, silhouette_mode = 'sample', sample_size = 5000):
+  import matplotlib.pyplot as plt
+  from k_sweep import sweep_k
+  # k = 2..9 fitted in parallel, results cached per (data, k range, seed)
+  scores = sweep_k(df, k_values = range(2, 10), silhouette = silhouette_mode, sample_size = sample_size)
+  K = scores['K'].tolist()
+  wsse = scores['WSSE'].tolist()
+  silhouette = scores['Silhouette'].tolist()
+
+  # plotting
+  k_best_fig = plt.figure(figsize=(10, 5))
+  plt.plot(K, wsse, c = 'c', marker = 'o', alpha = 0.8, label = 'WSSE')
+  plt.plot(K, silhouette, c = 'm', marker = 'o', alpha= 0.8, label = 'Silhouette')
+  plt.plot([5, 5], [0, 1], linestyle = '--', c = 'r', alpha = 0.7)
+  plt.ylim(0, 1)
+  plt.legend(loc = 'best')
+  plt.xlabel('Number of centroids', fontsize = 12)
+  plt.ylabel('Value', fontsize = 12)
+  plt.xticks(K, fontsize=10)
+  plt.yticks(fontsize=10)
+  plt.title('Elbow & Silhouette Method for optimal k', fontsize = 15)
+  plt.tight_layout()
+  return k_best_fig
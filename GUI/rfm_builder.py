@@ -0,0 +1,147 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+#------------------------------ Transactions -> RFM table ------------------------------
+# Same rules as the EDA notebook: rows with sale <= 0 and fully duplicated rows are
+# dropped, all purchases of a customer on one date form one order, Recency is counted
+# in days from the latest date in the cleaned data.
+TRANSACTION_DTYPES = {'customer_id' : 'object', 'date' : 'object',
+                      'purchased_quantity' : 'int32', 'sale' : 'float64'}
+STATE_COLS = ['first_day', 'last_day', 'orders', 'monetary']
+
+# read a transaction csv in bounded-memory chunks
+def read_transactions(path, chunksize = 100_000):
+  return pd.read_csv(path, dtype = TRANSACTION_DTYPES, chunksize = chunksize)
+
+def to_days(dates):
+  return pd.to_datetime(dates, format = '%Y-%m-%d').values.astype('datetime64[D]').astype(np.int32)
+
+def clean_transactions(chunk):
+  chunk = chunk[chunk['sale'] > 0]
+  return chunk[~chunk.duplicated(keep = False)]
+
+# one row per (customer_id, day) order with its total sale
+def order_totals(chunk):
+  orders = pd.DataFrame({
+    'customer_id' : chunk['customer_id'].values,
+    'day' : to_days(chunk['date']),
+    'sale' : chunk['sale'].values})
+  return orders.groupby(['customer_id', 'day'], sort = False)['sale'].sum().reset_index()
+
+# per-customer partial aggregate of one chunk, no python lambdas
+def aggregate_chunk(chunk):
+  orders = order_totals(chunk)
+  part = orders.groupby('customer_id', sort = False).agg(
+    first_day = ('day', 'min'),
+    last_day = ('day', 'max'),
+    orders = ('day', 'size'),
+    monetary = ('sale', 'sum'))
+  return part
+
+
+class RFMAccumulator:
+  # partials are only merged once they outgrow the merged state, which keeps the
+  # total merge work linear in the number of rows
+  def __init__(self):
+    self.state = pd.DataFrame({col : pd.Series(dtype = 'int64') for col in STATE_COLS})
+    self.state.index.name = 'customer_id'
+    self.state['monetary'] = self.state['monetary'].astype('float64')
+    self.pending = []
+    self.pending_rows = 0
+
+  def add(self, part):
+    if len(part) == 0:
+      return self
+    self.pending.append(part)
+    self.pending_rows += len(part)
+    if self.pending_rows > max(len(self.state), 100_000):
+      self.compact()
+    return self
+
+  def update(self, chunk):
+    return self.add(aggregate_chunk(clean_transactions(chunk)))
+
+  def compact(self):
+    if not self.pending:
+      return self.state
+    parts = pd.concat([self.state] + self.pending)
+    self.pending, self.pending_rows = [], 0
+    order = np.argsort(parts.index.values, kind = 'stable')
+    parts = parts.iloc[order]
+    # an order split over two partials would be counted twice, so partials of a
+    # customer must follow each other in time
+    same = parts.index.values[1:] == parts.index.values[:-1]
+    overlap = same & (parts['first_day'].values[1:] <= parts['last_day'].values[:-1])
+    if overlap.any():
+      customer = parts.index.values[1:][overlap][0]
+      raise ValueError(f"transactions of customer {customer} go back in time across chunks; "
+                       "sort the input by customer_id or by date")
+    self.state = parts.groupby(level = 0, sort = True).agg({
+      'first_day' : 'min', 'last_day' : 'max', 'orders' : 'sum', 'monetary' : 'sum'})
+    self.state.index.name = 'customer_id'
+    return self.state
+
+  def merge(self, other):
+    self.pending.extend([other.state] + other.pending)
+    self.pending_rows += len(other.state) + other.pending_rows
+    return self
+
+  def result(self, max_day = None):
+    state = self.compact()
+    if max_day is None:
+      max_day = state['last_day'].max()
+    return pd.DataFrame({
+      'Recency' : (max_day - state['last_day']).astype('int64'),
+      'Frequency' : state['orders'].astype('int64'),
+      'Monetary' : state['monetary'].round(2)}, index = state.index)
+
+
+# split a stream of chunks so that no (customer_id, date) order spans two of them.
+# Rows of the chunk's last customer, and rows of any customer from its purchase on the
+# last row's date onwards, are held back and prepended to the next chunk; this is
+# enough for files sorted by customer or by date.
+def whole_orders(chunks):
+  carry = None
+  for chunk in chunks:
+    if carry is not None and len(carry):
+      chunk = pd.concat([carry, chunk], ignore_index = True)
+    customers = chunk['customer_id'].values
+    last = chunk.iloc[-1]
+    held = (customers == last['customer_id']) | (chunk['date'].values == last['date'])
+    pos = np.arange(len(chunk))
+    first_held = pd.Series(pos[held]).groupby(customers[held]).min()
+    held = pos >= pd.Series(customers).map(first_held).fillna(len(chunk)).values
+    carry = chunk[held]
+    if (~held).any():
+      yield chunk[~held]
+  if carry is not None and len(carry):
+    yield carry
+
+# R, F, M quartile scores as computed in the EDA notebook
+def score_rfm(rfm_df):
+  r_groups = pd.qcut(rfm_df['Recency'].rank(method='first'), q=4, labels=range(4, 0, -1))
+  f_groups = pd.qcut(rfm_df['Frequency'].rank(method='first'), q=4, labels=range(1, 5, 1))
+  m_groups = pd.qcut(rfm_df['Monetary'].rank(method='first'), q=4, labels=range(1, 5, 1))
+  return rfm_df.assign(R = r_groups.astype('int64').values,
+                       F = f_groups.astype('int64').values,
+                       M = m_groups.astype('int64').values)
+
+def build_rfm(path, chunksize = 100_000):
+  acc = RFMAccumulator()
+  for chunk in whole_orders(read_transactions(path, chunksize)):
+    acc.update(chunk)
+  return score_rfm(acc.result())
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Build the RFM table from a transaction csv')
+  parser.add_argument('transactions', help = 'csv shaped like data/CDnow_MasterData.csv')
+  parser.add_argument('output', help = 'where to write the RFM csv')
+  parser.add_argument('--chunksize', type = int, default = 100_000)
+  parser.add_argument('--keep-ids', action = 'store_true', help = 'also write the customer_id column')
+  args = parser.parse_args()
+
+  rfm = build_rfm(args.transactions, chunksize = args.chunksize)
+  rfm.to_csv(args.output, index = args.keep_ids)
+  print(f'{len(rfm)} customers written to {args.output}')
@@ -0,0 +1,111 @@
+import argparse
+import glob
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rfm_builder import TRANSACTION_DTYPES, RFMAccumulator, aggregate_chunk, clean_transactions, score_rfm
+
+#------------------------------ Partitioned RFM aggregation -----------------------------
+# Two passes over a process pool. Map: every transaction csv is cut into byte-range
+# splits at line boundaries, and each split is hash-partitioned by customer_id into
+# shard pieces (feather files in a work directory). Reduce: each shard holds all rows of
+# its customers, so it is cleaned and aggregated on its own (duplicates and orders never
+# span shards). The per-shard states are disjoint and only need concatenating; Recency
+# is taken from the global latest day, so the table equals rfm_builder.build_rfm.
+SPLIT_BYTES = 64 * 2**20
+
+def shard_of(customer_ids, n_shards):
+  # siphash with a fixed key: the same id lands in the same shard in every process
+  hashes = pd.util.hash_array(np.asarray(customer_ids, dtype = object), categorize = False)
+  return (hashes % np.uint64(n_shards)).astype(np.int64)
+
+# (path, start, end) byte ranges of about split_bytes, each starting at a line start
+# after the header; rows with quoted newlines are not supported
+def csv_splits(path, split_bytes = SPLIT_BYTES):
+  size = os.path.getsize(path)
+  splits = []
+  with open(path, 'rb') as f:
+    start = len(f.readline())
+    while start < size:
+      f.seek(min(start + split_bytes, size))
+      if f.tell() < size:
+        f.readline()
+      end = f.tell()
+      splits.append((path, start, end))
+      start = end
+  return splits
+
+def read_split(path, start, end):
+  with open(path, 'rb') as f:
+    names = f.readline().decode().strip().split(',')
+    f.seek(start)
+    data = f.read(end - start)
+  return pd.read_csv(io.BytesIO(data), names = names, header = None, dtype = TRANSACTION_DTYPES)
+
+def _partition_split(split, split_id, n_shards, work_dir):
+  chunk = read_split(*split)
+  shards = shard_of(chunk['customer_id'].values, n_shards)
+  order = np.argsort(shards, kind = 'stable')
+  bounds = np.searchsorted(shards[order], np.arange(n_shards + 1))
+  for shard in range(n_shards):
+    rows = order[bounds[shard]:bounds[shard + 1]]
+    if len(rows):
+      piece = chunk.iloc[rows].reset_index(drop = True)
+      piece.to_feather(os.path.join(work_dir, f'{shard:05d}-{split_id:06d}.feather'))
+  return len(chunk)
+
+def _aggregate_shard(shard, work_dir):
+  pieces = sorted(glob.glob(os.path.join(work_dir, f'{shard:05d}-*.feather')))
+  if not pieces:
+    return None
+  chunk = pd.concat([pd.read_feather(p) for p in pieces], ignore_index = True)
+  return aggregate_chunk(clean_transactions(chunk))
+
+def _run(pool, fn, *arg_lists):
+  if pool is None:
+    return list(map(fn, *arg_lists))
+  return list(pool.map(fn, *arg_lists))
+
+# same table as build_rfm(path) for one csv; several csv files (e.g. daily exports) are
+# treated as one transaction log
+def build_rfm_partitioned(paths, n_jobs = None, n_shards = None, work_dir = None,
+                          split_bytes = SPLIT_BYTES):
+  paths = [paths] if isinstance(paths, str) else list(paths)
+  n_jobs = n_jobs or os.cpu_count() or 1
+  n_shards = n_shards or 4 * n_jobs
+  splits = [s for path in paths for s in csv_splits(path, split_bytes)]
+  tmp = tempfile.mkdtemp(prefix = 'rfm_shards_', dir = work_dir)
+  pool = ProcessPoolExecutor(max_workers = n_jobs) if n_jobs > 1 else None
+  try:
+    _run(pool, _partition_split, splits, range(len(splits)), [n_shards] * len(splits), [tmp] * len(splits))
+    states = _run(pool, _aggregate_shard, range(n_shards), [tmp] * n_shards)
+  finally:
+    if pool is not None:
+      pool.shutdown()
+    shutil.rmtree(tmp, ignore_errors = True)
+  # shards share no customer: the merged state is just the sorted concatenation
+  acc = RFMAccumulator()
+  states = [state for state in states if state is not None]
+  if states:
+    acc.state = pd.concat(states).sort_index(kind = 'stable')
+  return score_rfm(acc.result())
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Build the RFM table from transaction csv files in a process pool')
+  parser.add_argument('transactions', nargs = '+', help = 'csv files shaped like data/CDnow_MasterData.csv')
+  parser.add_argument('--output', required = True, help = 'where to write the RFM csv')
+  parser.add_argument('--jobs', type = int, default = None, help = 'worker processes (default: all cores)')
+  parser.add_argument('--shards', type = int, default = None, help = 'customer partitions (default: 4 per worker)')
+  parser.add_argument('--work-dir', default = None, help = 'where shard files are written (default: system temp)')
+  parser.add_argument('--keep-ids', action = 'store_true', help = 'also write the customer_id column')
+  args = parser.parse_args()
+
+  rfm = build_rfm_partitioned(args.transactions, n_jobs = args.jobs, n_shards = args.shards, work_dir = args.work_dir)
+  rfm.to_csv(args.output, index = args.keep_ids)
+  print(f'{len(rfm)} customers written to {args.output}')
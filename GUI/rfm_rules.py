@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+#--------------------------------- Segment rules -------------------------------------
+# Rules are checked in order like an if/elif chain: the first rule whose conditions
+# all hold gives the label, otherwise the default label is used.
+# Each condition maps a column to the values it is allowed to take, or with Not(...)
+# to the values it must not take.
+class Not:
+  def __init__(self, values):
+    self.values = list(values)
+
+  def __repr__(self):
+    return f'Not({self.values!r})'
+
+
+RFM_RULES = [
+  ('Left', {'R': [1, 2]}),
+  ('Regular', {'R': [3, 4], 'F': Not([4])}),
+  ('Leaving', {'R': [3], 'F': [4], 'M': [4]}),
+]
+RFM_DEFAULT = 'Loyal'
+
+# KMeans cluster id -> segment name (kmeans_artifact.py assigns the ids to match)
+K_LABELS = {1: 'Left', 2: 'Potential', 3: 'Star'}
+K_DEFAULT = 'Regular'
+
+# classifier code (DC_rmf.joblib) -> RFM segment name
+CLF_LABELS = {1: 'Left', 2: 'Regular', 3: 'Leaving'}
+CLF_DEFAULT = 'Loyal'
+
+SCORES = range(1, 5)
+
+
+class SegmentRules:
+  def __init__(self, rules, default, cols = ('R', 'F', 'M')):
+    self.rules = [(name, dict(conds)) for name, conds in rules]
+    self.default = default
+    self.cols = list(cols)
+    self.names = np.array([name for name, _ in self.rules] + [default], dtype = object)
+    self.cube = self._compile_cube()
+
+  # evaluate every rule once for each cell of the 4x4x4 score cube
+  def _compile_cube(self):
+    grid = np.meshgrid(*[np.arange(1, 5)] * len(self.cols), indexing = 'ij')
+    cells = {col: g.ravel() for col, g in zip(self.cols, grid)}
+    codes = self._select(cells)
+    return codes.reshape([len(SCORES)] * len(self.cols)).astype(np.int8)
+
+  # np.select over the rule masks, returns the index into self.names
+  def _select(self, cols):
+    masks = []
+    for _, conds in self.rules:
+      mask = np.ones(len(next(iter(cols.values()))), dtype = bool)
+      for col, values in conds.items():
+        if isinstance(values, Not):
+          mask &= ~np.isin(cols[col], values.values)
+        else:
+          mask &= np.isin(cols[col], values)
+      masks.append(mask)
+    return np.select(masks, np.arange(len(self.rules)), default = len(self.rules))
+
+  def codes(self, df):
+    cols = {col: np.asarray(df[col]) for col in self.cols}
+    # fractional scores would be truncated by the cube index, rules compare them exactly
+    in_cube = all(((v >= 1) & (v <= 4)).all() and (np.issubdtype(v.dtype, np.integer) or (v == np.floor(v)).all())
+                  for v in cols.values())
+    if in_cube:
+      # fast path: one fancy-indexing lookup into the precompiled cube
+      idx = tuple(cols[col].astype(np.intp) - 1 for col in self.cols)
+      return self.cube[idx]
+    return self._select(cols)
+
+  def label(self, df):
+    return self.names[self.codes(df)]
+
+
+rfm_rules = SegmentRules(RFM_RULES, RFM_DEFAULT)
+
+# vectorized replacement for rfm_df.apply(rfm_label, axis=1)
+def label_rfm(df):
+  return pd.Series(rfm_rules.label(df), index = df.index)
+
+# map integer codes to names through an array lookup instead of an if/elif chain;
+# codes missing from mapping get the default, negative codes are rejected since the
+# array lookup would wrap them around
+def lookup_labels(codes, mapping, default):
+  codes = np.asarray(codes)
+  if codes.size and codes.min() < 0:
+    raise ValueError(f'segment codes must be non-negative, got {codes.min()}')
+  codes = codes.astype(np.intp)
+  size = max(max(mapping) + 1, codes.max() + 1 if codes.size else 0)
+  table = np.full(size, default, dtype = object)
+  for code, name in mapping.items():
+    table[code] = name
+  return table[codes]
+
+# vectorized replacement for df.apply(labeling, axis=1)
+# names: id -> name mapping stored with a KMeans artifact, K_LABELS by default
+def label_kmeans(k_labels, names = None):
+  names = lookup_labels(k_labels, K_LABELS if names is None else names, K_DEFAULT)
+  return pd.Series(names, index = getattr(k_labels, 'index', None))
+
+# names for the codes predicted by the RFM classifier
+def label_predictions(y_pred):
+  return lookup_labels(y_pred, CLF_LABELS, CLF_DEFAULT)
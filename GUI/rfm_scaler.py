@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+#------------------------------ log1p + robust scaling ----------------------------------
+# Same result as RobustScaler().fit_transform(np.log1p(values)) with the default 25-75
+# quantile range, but fitted once and persisted (inside the KMeans artifact), and applied
+# in float32 on one array: log1p, centering and scaling run in place block by block so
+# each block is still in cache for the next step.
+FEATURES = ['Recency', 'Frequency', 'Monetary']
+BLOCK_ROWS = 65_536
+
+def as_float32(data, columns = FEATURES, copy = True):
+  if isinstance(data, pd.DataFrame):
+    return data[columns].to_numpy(dtype = np.float32)
+  return np.array(data, dtype = np.float32) if copy else np.asarray(data, dtype = np.float32)
+
+
+class LogRobustScaler:
+  def __init__(self, center = None, scale = None, columns = FEATURES):
+    self.center = None if center is None else np.asarray(center, dtype = np.float32)
+    self.scale = None if scale is None else np.asarray(scale, dtype = np.float32)
+    self.columns = list(columns)
+
+  def fit(self, data):
+    logs = np.log1p(np.asarray(data[self.columns] if isinstance(data, pd.DataFrame) else data, dtype = np.float64))
+    q25, median, q75 = np.nanpercentile(logs, [25, 50, 75], axis = 0)
+    scale = q75 - q25
+    # constant columns are only centered, like sklearn
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+    self.center = median.astype(np.float32)
+    self.scale = scale.astype(np.float32)
+    return self
+
+  # copy = False scales a float32 array in place (a DataFrame is always copied once)
+  def transform(self, data, copy = True):
+    X = as_float32(data, self.columns, copy)
+    for start in range(0, len(X), BLOCK_ROWS):
+      block = X[start:start + BLOCK_ROWS]
+      np.log1p(block, out = block)
+      block -= self.center
+      block /= self.scale
+    return X
+
+  def fit_transform(self, data, copy = True):
+    return self.fit(data).transform(data, copy)
@@ -0,0 +1,145 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+#------------------------------ KLL quantile sketch ------------------------------------
+# Items live in compactors; an item at level h stands for 2**h inputs. When a level
+# outgrows its capacity it is sorted and every other item (random offset) is promoted.
+# Memory stays O(k) whatever the stream length, and sketches of separate partitions
+# can be merged level by level.
+class KLLSketch:
+  def __init__(self, k = 200, seed = None):
+    self.k = k
+    self.n = 0
+    self.levels = [np.empty(0)]
+    self.rng = np.random.default_rng(seed)
+    self._cdf = None
+
+  def capacity(self, level):
+    depth = len(self.levels) - level - 1
+    return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+  def update(self, values):
+    values = np.asarray(values, dtype = np.float64).ravel()
+    values = values[~np.isnan(values)]
+    self.levels[0] = np.concatenate([self.levels[0], values])
+    self.n += len(values)
+    self._compress()
+    return self
+
+  def merge(self, other):
+    while len(self.levels) < len(other.levels):
+      self.levels.append(np.empty(0))
+    for h, items in enumerate(other.levels):
+      self.levels[h] = np.concatenate([self.levels[h], items])
+    self.n += other.n
+    self._compress()
+    return self
+
+  def _compress(self):
+    self._cdf = None
+    h = 0
+    while h < len(self.levels):
+      items = self.levels[h]
+      if len(items) > self.capacity(h):
+        if h + 1 == len(self.levels):
+          self.levels.append(np.empty(0))
+        items = np.sort(items)
+        # an odd item out stays at this level
+        rest, items = items[len(items) - len(items) % 2:], items[:len(items) - len(items) % 2]
+        promoted = items[self.rng.integers(2)::2]
+        self.levels[h] = rest
+        self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+      h += 1
+
+  def size(self):
+    return sum(len(items) for items in self.levels)
+
+  def cdf(self):
+    if self._cdf is None:
+      items = np.concatenate(self.levels)
+      weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+      order = np.argsort(items, kind = 'stable')
+      self._cdf = items[order], np.cumsum(weights[order])
+    return self._cdf
+
+  # estimated fraction of inputs below (or, inclusive, at or below) each value
+  def rank(self, values, inclusive = False):
+    items, cum = self.cdf()
+    pos = np.searchsorted(items, values, side = 'right' if inclusive else 'left')
+    below = np.where(pos > 0, cum[np.maximum(pos - 1, 0)], 0.0)
+    return below / cum[-1]
+
+  def quantile(self, qs):
+    items, cum = self.cdf()
+    pos = np.searchsorted(cum, np.asarray(qs) * cum[-1], side = 'left')
+    return items[np.minimum(pos, len(items) - 1)]
+
+
+#------------------------------ Streaming R/F/M scoring --------------------------------
+RFM_VALUES = {'R' : 'Recency', 'F' : 'Frequency', 'M' : 'Monetary'}
+
+def read_rfm(path, chunksize = 100_000):
+  return pd.read_csv(path, usecols = list(RFM_VALUES.values()), chunksize = chunksize)
+
+# first pass: one sketch per column
+def sketch_rfm(chunks, k = 200, seed = 0):
+  sketches = {col : KLLSketch(k = k, seed = seed) for col in RFM_VALUES.values()}
+  for chunk in chunks:
+    for col, sketch in sketches.items():
+      sketch.update(chunk[col].values)
+  return sketches
+
+# quartile (1..4) of each value given its row position in the whole stream. Values tied
+# with others are spread over their rank interval by row position, which is how
+# rank(method='first') breaks ties before pd.qcut.
+def approx_quartile(sketch, values, positions):
+  lo = sketch.rank(values)
+  hi = sketch.rank(values, inclusive = True)
+  rank = lo + (hi - lo) * (np.asarray(positions) + 0.5) / sketch.n
+  return 1 + np.searchsorted([0.25, 0.5, 0.75], rank, side = 'left')
+
+# second pass: score chunk by chunk, nothing is sorted beyond the sketches
+def score_rfm_approx(chunks, sketches):
+  offset = 0
+  for chunk in chunks:
+    positions = np.arange(offset, offset + len(chunk))
+    offset += len(chunk)
+    scores = {}
+    for score, col in RFM_VALUES.items():
+      q = approx_quartile(sketches[col], chunk[col].values, positions)
+      scores[score] = 5 - q if score == 'R' else q
+    yield chunk.assign(**scores)
+
+# rank error of the sketch quantiles against the exact data
+def rank_error(sketch, values, qs = np.linspace(0.01, 0.99, 99)):
+  exact = np.sort(np.asarray(values, dtype = np.float64))
+  estimate = sketch.quantile(qs)
+  lo = np.searchsorted(exact, estimate, side = 'left') / len(exact)
+  hi = np.searchsorted(exact, estimate, side = 'right') / len(exact)
+  return np.maximum(0, np.maximum(lo - qs, qs - hi))
+
+def error_report(path, k = 200, chunksize = 100_000, seed = 0):
+  from rfm_builder import score_rfm
+  sketches = sketch_rfm(read_rfm(path, chunksize), k = k, seed = seed)
+  approx = pd.concat(score_rfm_approx(read_rfm(path, chunksize), sketches), ignore_index = True)
+  exact = score_rfm(approx[list(RFM_VALUES.values())])
+  rows = []
+  for score, col in RFM_VALUES.items():
+    err = rank_error(sketches[col], exact[col])
+    rows.append({
+      'Feature' : col,
+      'SketchItems' : sketches[col].size(),
+      'MaxRankError' : err.max(),
+      'QuartileRankError' : err[[24, 49, 74]].max(),
+      'ScoreAgreement' : (approx[score].values == exact[score].values).mean()})
+  return pd.DataFrame(rows)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Compare sketch-based R/F/M quartiles with exact qcut')
+  parser.add_argument('rfm', nargs = '?', default = 'data/RFM_data.csv')
+  parser.add_argument('-k', type = int, default = 200, help = 'sketch accuracy parameter')
+  parser.add_argument('--chunksize', type = int, default = 100_000)
+  args = parser.parse_args()
+  print(error_report(args.rfm, k = args.k, chunksize = args.chunksize).to_string(index = False))
@@ -0,0 +1,113 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from customer_table import rfm_labels
+from rfm_builder import clean_transactions, order_totals, read_transactions, score_rfm, whole_orders
+
+#------------------------------ RFM snapshots over time ---------------------------------
+# Orders are sorted once by (customer, day) and carry per-customer running order counts
+# and running spend. The RFM table as of a date then only needs each customer's last
+# order on or before it, found for all customers with one searchsorted on the sorted
+# (customer, day) keys, so N snapshot dates cost N lookups instead of N aggregations.
+# A snapshot equals build_rfm run on the transactions up to that date, with Recency
+# counted from the snapshot date.
+DAY_SPAN = np.int64(2**32)
+NEW = 'New'
+
+def to_day(date):
+  return int(np.datetime64(pd.Timestamp(date).date(), 'D').astype(np.int64))
+
+
+class RFMSnapshots:
+  def __init__(self, customer_ids, day, frequency, monetary, starts):
+    self.customer_ids = customer_ids
+    self.day = day
+    self.frequency = frequency
+    self.monetary = monetary
+    self.starts = starts
+    self.day0 = int(day.min()) if len(day) else 0
+    codes = np.repeat(np.arange(len(starts), dtype = np.int64), np.diff(np.append(starts, len(day))))
+    self.keys = codes * DAY_SPAN + (day - self.day0)
+
+  @classmethod
+  def from_orders(cls, orders):
+    codes, ids = pd.factorize(orders['customer_id'], sort = True)
+    day = orders['day'].to_numpy(dtype = np.int64)
+    order = np.lexsort((day, codes))
+    codes, day = codes[order], day[order]
+    sale = orders['sale'].to_numpy(dtype = np.float64)[order]
+    counts = np.bincount(codes, minlength = len(ids))
+    starts = np.cumsum(counts) - counts
+    frequency = np.arange(len(codes)) - np.repeat(starts, counts) + 1
+    monetary = pd.Series(sale).groupby(codes, sort = False).cumsum().to_numpy()
+    return cls(pd.Index(ids, name = 'customer_id'), day, frequency, monetary, starts)
+
+  @classmethod
+  def from_transactions(cls, path, chunksize = 100_000):
+    orders = [order_totals(clean_transactions(chunk)) for chunk in whole_orders(read_transactions(path, chunksize))]
+    return cls.from_orders(pd.concat(orders, ignore_index = True))
+
+  @property
+  def first_date(self):
+    return pd.Timestamp(np.datetime64(int(self.day.min()), 'D'))
+
+  @property
+  def last_date(self):
+    return pd.Timestamp(np.datetime64(int(self.day.max()), 'D'))
+
+  # snapshot dates every freq (pandas offset alias) from the first to the last order
+  def dates(self, freq = 'M'):
+    return pd.date_range(self.first_date, self.last_date, freq = freq)
+
+  # RFM table, scores and RFM_label of the customers with an order on or before as_of
+  def at(self, as_of):
+    day = to_day(as_of)
+    offset = np.clip(day - self.day0, -1, DAY_SPAN - 1)
+    ends = np.searchsorted(self.keys, np.arange(len(self.starts), dtype = np.int64) * DAY_SPAN + offset, side = 'right')
+    present = ends > self.starts
+    last = ends[present] - 1
+    rfm = pd.DataFrame({
+      'Recency' : (day - self.day[last]).astype('int64'),
+      'Frequency' : self.frequency[last].astype('int64'),
+      'Monetary' : np.round(self.monetary[last], 2)}, index = self.customer_ids[present])
+    if len(rfm) < 4:
+      raise ValueError(f'{len(rfm)} customers as of {as_of}, quartile scores need at least 4')
+    rfm = score_rfm(rfm)
+    rfm['RFM_label'] = rfm_labels(rfm)
+    return rfm
+
+  def snapshots(self, dates):
+    return {pd.Timestamp(date) : self.at(date) for date in dates}
+
+# customer counts moving from each segment of before (rows, NEW for customers without
+# an order yet) to each segment of after (columns); normalize gives row shares
+def transition_matrix(before, after, label = 'RFM_label', normalize = False):
+  source = before[label].reindex(after.index).astype(object).fillna(NEW).rename('from')
+  target = after[label].astype(object).rename('to')
+  return pd.crosstab(source, target, normalize = 'index' if normalize else False)
+
+# transition matrices between consecutive snapshots, keyed by (from date, to date)
+def transitions(snapshots, label = 'RFM_label', normalize = False):
+  dates = sorted(snapshots)
+  return {(d0, d1) : transition_matrix(snapshots[d0], snapshots[d1], label, normalize)
+          for d0, d1 in zip(dates[:-1], dates[1:])}
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'RFM snapshots at regular as-of dates')
+  parser.add_argument('transactions', help = 'csv shaped like data/CDnow_MasterData.csv')
+  parser.add_argument('output', help = 'where to write the snapshots csv (one row per date and customer)')
+  parser.add_argument('--freq', default = 'M', help = 'pandas offset alias of the snapshot dates')
+  parser.add_argument('--transitions', help = 'also write the transition counts (from, to, dates) here')
+  args = parser.parse_args()
+
+  engine = RFMSnapshots.from_transactions(args.transactions)
+  snapshots = engine.snapshots(engine.dates(args.freq))
+  table = pd.concat(snapshots, names = ['as_of'])
+  table.to_csv(args.output)
+  print(f'{len(snapshots)} snapshots, {len(table)} rows written to {args.output}')
+  if args.transitions:
+    moves = pd.concat({d1 : m.stack() for (d0, d1), m in transitions(snapshots).items()}, names = ['as_of'])
+    moves.rename('customers').to_csv(args.transitions)
+    print(f'transition counts written to {args.transitions}')
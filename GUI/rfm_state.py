@@ -0,0 +1,215 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from joblib import dump, load
+
+from rfm_builder import RFMAccumulator, aggregate_chunk, clean_transactions, read_transactions, whole_orders
+from rfm_rules import label_rfm
+
+#------------------------------ Incremental RFM state store ------------------------------
+# Per customer the store keeps last purchase day, order count and monetary sum, plus one
+# sorted key array per score. A key packs the ranked value with the customer's row number
+# (the 'first' tie-break of rank), so the qcut boundaries are simply the keys found at
+# the quartile rank positions. A delta only moves the keys of the customers it touches,
+# and only customers between the old and the new boundaries can change quartile.
+# Several deltas are applied as one batch: one aggregation, one merge per key array.
+SEQ_BITS = 32
+SEQ_MASK = (1 << SEQ_BITS) - 1
+SCORE_COLS = ['R', 'F', 'M']
+
+# rank positions (1-based, inclusive) closing quartiles 1..3, same as
+# pd.qcut(values.rank(method='first'), q=4)
+def quartile_cuts(n):
+  return np.array([1 + (j * (n - 1)) // 4 for j in (1, 2, 3)], dtype = np.int64)
+
+def quartile_of(positions, n):
+  ranks = np.asarray(positions) + 1
+  return 1 + (ranks[:, None] > quartile_cuts(n)[None, :]).sum(axis = 1)
+
+def pack_keys(values, seq):
+  values = np.asarray(values, dtype = np.int64)
+  if values.size and np.abs(values).max() >= (1 << (62 - SEQ_BITS)):
+    raise ValueError('value too large to be ranked in the state store')
+  return (values << SEQ_BITS) | np.asarray(seq, dtype = np.int64)
+
+# sorted keys without removed and with inserted, built in a single pass over keys
+def merge_keys(keys, removed, inserted):
+  keep = np.ones(len(keys), dtype = bool)
+  keep[np.searchsorted(keys, removed)] = False
+  inserted = np.sort(inserted)
+  # slot of each inserted key in the merged array: kept keys before it plus its rank
+  pos = np.searchsorted(keys, inserted)
+  removed_before = np.concatenate([[0], np.cumsum(~keep)])
+  slots = pos - removed_before[pos] + np.arange(len(inserted))
+  merged = np.empty(keep.sum() + len(inserted), dtype = keys.dtype)
+  fill = np.ones(len(merged), dtype = bool)
+  fill[slots] = False
+  merged[slots] = inserted
+  merged[fill] = keys[keep]
+  return merged
+
+
+class RFMStateStore:
+  def __init__(self, state, max_day):
+    # state rows are ordered by customer_id, row number == tie-break sequence
+    self.state = state
+    self.max_day = int(max_day)
+    self.rescore()
+
+  @classmethod
+  def from_transactions(cls, path, chunksize = 100_000):
+    acc = RFMAccumulator()
+    for chunk in whole_orders(read_transactions(path, chunksize)):
+      acc.update(chunk)
+    state = acc.compact()[['last_day', 'orders', 'monetary']].copy()
+    return cls(state, state['last_day'].max())
+
+  @classmethod
+  def load(cls, path):
+    store = cls.__new__(cls)
+    store.__dict__.update(load(path))
+    return store
+
+  def save(self, path):
+    dump(self.__dict__, path)
+
+  # ranked value per score; R ranks Recency ascending, i.e. last purchase day descending
+  def _values(self, rows):
+    state = self.state.iloc[rows] if rows is not None else self.state
+    return {
+      'R' : -state['last_day'].values.astype(np.int64),
+      'F' : state['orders'].values.astype(np.int64),
+      'M' : np.rint(state['monetary'].values * 100).astype(np.int64)}
+
+  def _keys(self, rows):
+    seq = np.arange(len(self.state)) if rows is None else rows
+    return {col : pack_keys(values, seq) for col, values in self._values(rows).items()}
+
+  def _score(self, rows):
+    n = len(self.state)
+    keys = self._keys(rows)
+    scores = {}
+    for col in SCORE_COLS:
+      q = quartile_of(np.searchsorted(self.keys[col], keys[col]), n)
+      scores[col] = 5 - q if col == 'R' else q
+    return pd.DataFrame(scores, index = self.state.index[rows])
+
+  # full recomputation, also used when new customers break the customer_id order
+  def rescore(self):
+    self.state = self.state.sort_index()
+    self.keys = {col : np.sort(k) for col, k in self._keys(None).items()}
+    scores = self._score(np.arange(len(self.state)))
+    for col in SCORE_COLS:
+      self.state[col] = scores[col].values
+    self.state['RFM_label'] = label_rfm(self.state).values
+    return len(self.state)
+
+  # Recency / Frequency / Monetary values at the three quartile cuts
+  def boundaries(self):
+    cuts = quartile_cuts(len(self.state)) - 1
+    values = {col : keys[cuts] >> SEQ_BITS for col, keys in self.keys.items()}
+    return {
+      'Recency' : self.max_day + values['R'],
+      'Frequency' : values['F'],
+      'Monetary' : values['M'] / 100}
+
+  # deltas must be newer than the stored state, not than each other; each is cleaned
+  # on its own as when applied one by one
+  def update(self, *deltas):
+    part = aggregate_chunk(pd.concat([clean_transactions(delta) for delta in deltas], ignore_index = True))
+    if len(part) == 0:
+      return 0
+    rows = self.state.index.get_indexer(part.index)
+    known = rows >= 0
+    old = self.state.iloc[rows[known]]
+    old_part = part[known]
+    if (old_part['first_day'].values < old['last_day'].values).any():
+      raise ValueError('delta contains transactions older than the stored state')
+    # a purchase on the stored last day belongs to the order already counted
+    same_order = (old_part['first_day'].values == old['last_day'].values).astype(np.int64)
+
+    new_part = part[~known]
+    if len(new_part) and new_part.index.min() < self.state.index.max():
+      self._apply(rows[known], old_part, same_order)
+      self._append(new_part)
+      return self.rescore()
+
+    old_keys = self._keys(rows[known])
+    old_cuts = {col : keys[quartile_cuts(len(keys)) - 1] for col, keys in self.keys.items()}
+    self._apply(rows[known], old_part, same_order)
+    first_new = len(self.state)
+    self._append(new_part)
+    touched = np.concatenate([rows[known], np.arange(first_new, len(self.state))])
+    new_keys = self._keys(touched)
+
+    affected = [touched]
+    for col in SCORE_COLS:
+      keys = merge_keys(self.keys[col], old_keys[col], new_keys[col])
+      self.keys[col] = keys
+      # customers whose key lies between an old and a new boundary may switch quartile
+      new_cuts = keys[quartile_cuts(len(keys)) - 1]
+      for lo, hi in zip(np.minimum(old_cuts[col], new_cuts), np.maximum(old_cuts[col], new_cuts)):
+        between = keys[np.searchsorted(keys, lo):np.searchsorted(keys, hi, side = 'right')]
+        affected.append(between & SEQ_MASK)
+    affected = np.unique(np.concatenate(affected))
+
+    scores = self._score(affected)
+    labels = label_rfm(scores).values
+    for col in SCORE_COLS:
+      self.state.iloc[affected, self.state.columns.get_loc(col)] = scores[col].values
+    self.state.iloc[affected, self.state.columns.get_loc('RFM_label')] = labels
+    return len(affected)
+
+  def _apply(self, rows, part, same_order):
+    self.state.iloc[rows, self.state.columns.get_loc('last_day')] = part['last_day'].values
+    orders = self.state['orders'].values[rows] + part['orders'].values - same_order
+    self.state.iloc[rows, self.state.columns.get_loc('orders')] = orders
+    monetary = self.state['monetary'].values[rows] + part['monetary'].values
+    self.state.iloc[rows, self.state.columns.get_loc('monetary')] = monetary
+    if len(part):
+      self.max_day = max(self.max_day, int(part['last_day'].max()))
+
+  def _append(self, part):
+    if len(part) == 0:
+      return
+    new = part[['last_day', 'orders', 'monetary']].sort_index()
+    self.state = pd.concat([self.state, new])
+    self.state.index.name = 'customer_id'
+    self.max_day = max(self.max_day, int(new['last_day'].max()))
+
+  def table(self):
+    state = self.state
+    return pd.DataFrame({
+      'Recency' : (self.max_day - state['last_day']).astype('int64'),
+      'Frequency' : state['orders'].astype('int64'),
+      'Monetary' : state['monetary'].round(2),
+      'R' : state['R'].astype('int64'),
+      'F' : state['F'].astype('int64'),
+      'M' : state['M'].astype('int64'),
+      'RFM_label' : state['RFM_label']}, index = state.index)
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Maintain an RFM state store from transaction deltas')
+  sub = parser.add_subparsers(dest = 'command', required = True)
+  init = sub.add_parser('init', help = 'build the store from a full transaction history')
+  init.add_argument('transactions')
+  init.add_argument('store')
+  update = sub.add_parser('update', help = 'apply csv files of new transactions as one batch')
+  update.add_argument('store')
+  update.add_argument('delta', nargs = '+')
+  for p in (init, update):
+    p.add_argument('--output', help = 'also write the RFM table to this csv')
+  args = parser.parse_args()
+
+  if args.command == 'init':
+    store = RFMStateStore.from_transactions(args.transactions)
+    print(f'{len(store.state)} customers in {args.store}')
+  else:
+    store = RFMStateStore.load(args.store)
+    deltas = [pd.read_csv(path, dtype = {'customer_id' : 'object'}) for path in args.delta]
+    print(f'{store.update(*deltas)} customers rescored from {sum(map(len, deltas))} new transactions')
+  store.save(args.store)
+  if args.output:
+    store.table().drop(columns = 'RFM_label').to_csv(args.output, index = False)
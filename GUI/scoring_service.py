@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_score import FEATURES, MODEL_PATH, BatchScorer
+from rfm_rules import SCORES, label_predictions, label_rfm
+
+#------------------------------ HTTP scoring service ------------------------------------
+# Minimal asyncio HTTP/1.1 server (keep-alive, JSON bodies, no extra dependencies).
+#   POST /predict  {"Recency": 30, "Frequency": 4, "Monetary": 120.5}  -> classifier
+#                  {"R": 4, "F": 2, "M": 3}                            -> segment rules
+#                  a list of such objects is scored in one call
+#   GET  /health
+# Concurrent requests are merged by a MicroBatcher into one vectorized predict call per
+# latency window.
+SCORE_COLS = ['R', 'F', 'M']
+
+
+class MicroBatcher:
+  def __init__(self, predict, window_ms = 2.0, max_batch = 4096):
+    self.predict = predict
+    self.window = window_ms / 1000
+    self.max_batch = max_batch
+    self.queue = asyncio.Queue()
+    self.batches = 0
+    self.rows = 0
+
+  async def submit(self, rows):
+    future = asyncio.get_running_loop().create_future()
+    await self.queue.put((rows, future))
+    return await future
+
+  async def run(self):
+    loop = asyncio.get_running_loop()
+    while True:
+      items = [await self.queue.get()]
+      size = len(items[0][0])
+      deadline = loop.time() + self.window
+      while size < self.max_batch:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+          break
+        try:
+          item = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+          break
+        items.append(item)
+        size += len(item[0])
+      rows = np.concatenate([r for r, _ in items])
+      try:
+        labels = self.predict(rows)
+      except Exception:
+        # score the requests one by one so only the failing ones get the error
+        self.run_each(items)
+        continue
+      self.batches += 1
+      self.rows += len(rows)
+      start = 0
+      for r, future in items:
+        future.set_result(labels[start:start + len(r)])
+        start += len(r)
+
+  def run_each(self, items):
+    for rows, future in items:
+      try:
+        future.set_result(self.predict(rows))
+        self.batches += 1
+        self.rows += len(rows)
+      except Exception as e:
+        future.set_exception(e)
+
+
+class ScoringService:
+  def __init__(self, model_path = MODEL_PATH, window_ms = 2.0, max_batch = 4096):
+    self.scorer = BatchScorer(model_path)
+    self.values = MicroBatcher(self.predict_values, window_ms, max_batch)
+    self.scores = MicroBatcher(self.predict_scores, window_ms, max_batch)
+
+  def predict_values(self, rows):
+    return label_predictions(self.scorer.predict(pd.DataFrame(rows, columns = FEATURES)))
+
+  def predict_scores(self, rows):
+    return label_rfm(pd.DataFrame(rows, columns = SCORE_COLS)).values
+
+  async def predict(self, payload):
+    customers = payload if isinstance(payload, list) else [payload]
+    if not customers:
+      return []
+    if all(col in customers[0] for col in FEATURES):
+      batcher, cols = self.values, FEATURES
+    elif all(col in customers[0] for col in SCORE_COLS):
+      batcher, cols = self.scores, SCORE_COLS
+    else:
+      raise ValueError(f'each customer needs {FEATURES} or {SCORE_COLS}')
+    rows = np.array([[float(c[col]) for col in cols] for c in customers])
+    # reject bad rows here, before they share a batch with other requests
+    if not np.isfinite(rows).all():
+      raise ValueError('values must be finite numbers')
+    if cols is SCORE_COLS and not np.isin(rows, SCORES).all():
+      raise ValueError(f'R, F and M scores must be one of {list(SCORES)}')
+    labels = await batcher.submit(rows)
+    segments = [{'segment' : label} for label in labels]
+    return segments if isinstance(payload, list) else segments[0]
+
+  async def respond(self, writer, status, response, keep_alive):
+    data = json.dumps(response).encode()
+    writer.write(f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(data)}\r\n'
+                 f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode() + data)
+    await writer.drain()
+
+  async def handle(self, reader, writer):
+    try:
+      while True:
+        request_line = await reader.readline()
+        if not request_line:
+          break
+        headers = {}
+        try:
+          method, path, _ = request_line.decode('latin-1').split(' ', 2)
+          while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+              break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+          length = int(headers.get('content-length', 0))
+          if length < 0:
+            raise ValueError(f'negative Content-Length {length}')
+        except ValueError as e:
+          # the rest of the stream cannot be framed, answer and close
+          await self.respond(writer, '400 Bad Request', {'error' : f'malformed request: {e}'}, False)
+          break
+        body = await reader.readexactly(length)
+        status, response = await self.route(method, path, body)
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        await self.respond(writer, status, response, keep_alive)
+        if not keep_alive:
+          break
+    except (ConnectionError, asyncio.IncompleteReadError):
+      pass
+    finally:
+      writer.close()
+
+  async def route(self, method, path, body):
+    if method == 'GET' and path == '/health':
+      return '200 OK', {'status' : 'ok', 'batches' : self.values.batches + self.scores.batches,
+                        'rows' : self.values.rows + self.scores.rows}
+    if method == 'POST' and path == '/predict':
+      try:
+        return '200 OK', await self.predict(json.loads(body or b'null'))
+      except (ValueError, TypeError, KeyError, AttributeError) as e:
+        return '400 Bad Request', {'error' : str(e)}
+      except Exception as e:
+        return '500 Internal Server Error', {'error' : str(e)}
+    return '404 Not Found', {'error' : f'no route for {method} {path}'}
+
+  async def serve(self, host = '0.0.0.0', port = 8000):
+    workers = [asyncio.create_task(b.run()) for b in (self.values, self.scores)]
+    server = await asyncio.start_server(self.handle, host, port)
+    print(f'scoring service listening on {host}:{port}', flush = True)
+    try:
+      async with server:
+        await server.serve_forever()
+    finally:
+      for w in workers:
+        w.cancel()
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Serve the RFM segment model over HTTP')
+  parser.add_argument('--host', default = '0.0.0.0')
+  parser.add_argument('--port', type = int, default = 8000)
+  parser.add_argument('--model', default = MODEL_PATH)
+  parser.add_argument('--window-ms', type = float, default = 2.0, help = 'how long to collect a batch')
+  parser.add_argument('--max-batch', type = int, default = 4096)
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  service = ScoringService(args.model, window_ms = args.window_ms, max_batch = args.max_batch)
+  print(f'model loaded in {time.perf_counter() - start:.2f}s', flush = True)
+  asyncio.run(service.serve(args.host, args.port))
@@ -0,0 +1,65 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+from joblib import dump, load
+
+from storage import source_path
+
+#------------------------------ Segment summary cube ------------------------------------
+# Per segment label: customer count and share, Recency/Frequency/Monetary sums and means
+# and revenue share, computed in one bincount pass and persisted per
+# (dataset version, labeling). Tables and plots read this small frame instead of
+# regrouping the customer frame.
+CACHE_DIR = '.cache/segment_summary'
+VALUE_COLS = ['Recency', 'Frequency', 'Monetary']
+
+# cheap id for a file on disk: changes whenever the file is rewritten. For a csv with a
+# columnar copy it is the id of the file storage.load_df actually reads.
+def dataset_version(path):
+  path = source_path(path)
+  stat = os.stat(path)
+  return f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+
+def fingerprint(*arrays):
+  digest = hashlib.sha1()
+  for arr in arrays:
+    arr = np.ascontiguousarray(arr)
+    digest.update(str((arr.dtype, arr.shape)).encode())
+    digest.update(arr.tobytes() if arr.dtype != object else pd.util.hash_array(arr).tobytes())
+  return digest.hexdigest()
+
+def summarize(df, label):
+  codes, segments = pd.factorize(df[label], sort = True)
+  counts = np.bincount(codes, minlength = len(segments))
+  summary = pd.DataFrame({label : np.asarray(segments, dtype = object), 'Count' : counts})
+  for col in VALUE_COLS:
+    sums = np.bincount(codes, weights = df[col].to_numpy(dtype = np.float64), minlength = len(segments))
+    summary[col + 'Sum'] = sums
+    summary[col + 'Mean'] = sums / counts
+  summary['Percent'] = counts * 100 / counts.sum()
+  summary['RevenuePercent'] = summary['MonetarySum'] * 100 / summary['MonetarySum'].sum()
+  return summary
+
+# version identifies the data the labels were computed on (e.g. dataset_version(path)
+# plus the labeling rules); without one the label and value columns are fingerprinted
+def segment_summary(df, label, version = None, cache_dir = CACHE_DIR):
+  if version is None:
+    version = fingerprint(df[label].to_numpy(), *[df[col].to_numpy() for col in VALUE_COLS])
+  key = hashlib.sha1(repr((version, label)).encode()).hexdigest()
+  cache_file = os.path.join(cache_dir, key + '.joblib') if cache_dir else None
+  if cache_file and os.path.exists(cache_file):
+    return load(cache_file)
+  summary = summarize(df, label)
+  if cache_file:
+    os.makedirs(cache_dir, exist_ok = True)
+    dump(summary, cache_file)
+  return summary
+
+# layout of the former groupby().agg() tables
+def aggregation_table(summary, label):
+  table = summary[[label, 'RecencyMean', 'FrequencyMean', 'MonetaryMean', 'Count']].copy()
+  table[['RecencyMean', 'FrequencyMean', 'MonetaryMean']] = table[['RecencyMean', 'FrequencyMean', 'MonetaryMean']].round(0)
+  table['Percent'] = summary['Percent'].round(2)
+  return table
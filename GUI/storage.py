@@ -0,0 +1,113 @@
+import argparse
+import hashlib
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+#------------------------------ Columnar data storage -----------------------------------
+# Typed Feather (uncompressed, so reads are memory-mapped) or Parquet copies of the csv
+# files in data/. load_df prefers the columnar copy next to a csv and only reads the
+# requested columns; without one it falls back to the csv. A copy records the size and
+# sha1 of the csv it was made from in its schema metadata and is only used while they
+# match, since file times say nothing after a clone or checkout.
+TRANSACTION_SCHEMA = {'customer_id' : 'category', 'date' : 'datetime64[ns]',
+                      'purchased_quantity' : 'int32', 'sale' : 'float32'}
+RFM_SCHEMA = {'Recency' : 'int32', 'Frequency' : 'int32', 'Monetary' : 'float32',
+              'R' : 'int8', 'F' : 'int8', 'M' : 'int8'}
+SCHEMAS = {
+  'data/CDnow_MasterData.csv' : TRANSACTION_SCHEMA,
+  'data/RFM_data.csv' : RFM_SCHEMA,
+}
+FORMATS = {'feather' : '.feather', 'parquet' : '.parquet'}
+SOURCE_KEY = b'source_csv'
+# csv fingerprints keyed by (path, size, mtime), so an unchanged csv is hashed once
+_fingerprints = {}
+
+def columnar_path(csv_path, fmt = 'feather'):
+  return os.path.splitext(csv_path)[0] + FORMATS[fmt]
+
+def csv_fingerprint(csv_path):
+  stat = os.stat(csv_path)
+  key = (os.path.abspath(csv_path), stat.st_size, stat.st_mtime_ns)
+  if key not in _fingerprints:
+    sha1 = hashlib.sha1()
+    with open(csv_path, 'rb') as f:
+      for block in iter(lambda: f.read(1 << 20), b''):
+        sha1.update(block)
+    _fingerprints[key] = f'{stat.st_size}:{sha1.hexdigest()}'.encode()
+  return _fingerprints[key]
+
+def read_typed_csv(csv_path, schema, columns = None):
+  dtypes = {col : ('object' if dtype.startswith('datetime') else dtype) for col, dtype in schema.items()}
+  if 'customer_id' in dtypes:
+    # keep the zero padding of the ids
+    dtypes['customer_id'] = 'object'
+  df = pd.read_csv(csv_path, dtype = dtypes, usecols = columns)
+  for col, dtype in schema.items():
+    if col in df.columns and dtype.startswith('datetime'):
+      df[col] = pd.to_datetime(df[col], format = '%Y-%m-%d')
+    elif col in df.columns and dtype == 'category':
+      df[col] = df[col].astype('category')
+  return df
+
+def to_arrow(df):
+  table = pa.Table.from_pandas(df, preserve_index = False)
+  for i, field in enumerate(table.schema):
+    if pa.types.is_timestamp(field.type):
+      table = table.set_column(i, field.name, table.column(i).cast(pa.date32()))
+  return table
+
+def convert(csv_path, schema, fmt = 'feather'):
+  out_path = columnar_path(csv_path, fmt)
+  table = to_arrow(read_typed_csv(csv_path, schema))
+  table = table.replace_schema_metadata({**(table.schema.metadata or {}), SOURCE_KEY : csv_fingerprint(csv_path)})
+  if fmt == 'feather':
+    feather.write_feather(table, out_path, compression = 'uncompressed')
+  else:
+    pq.write_table(table, out_path)
+  return out_path
+
+def read_columnar(path, columns = None):
+  if path.endswith(FORMATS['parquet']):
+    table = pq.read_table(path, columns = columns, memory_map = True)
+  else:
+    table = feather.read_table(path, columns = columns, memory_map = True)
+  return table.to_pandas(date_as_object = False)
+
+def source_of(path):
+  if path.endswith(FORMATS['parquet']):
+    metadata = pq.read_schema(path).metadata
+  else:
+    with pa.memory_map(path) as f:
+      metadata = pa.ipc.open_file(f).schema.metadata
+  return (metadata or {}).get(SOURCE_KEY)
+
+# the file load_df reads for path: a columnar copy only when it was made from the
+# current csv, so a rewritten csv is never shadowed by a stale copy
+def source_path(path):
+  if path.endswith(tuple(FORMATS.values())):
+    return path
+  for fmt in FORMATS:
+    copy = columnar_path(path, fmt)
+    if os.path.exists(copy) and source_of(copy) == csv_fingerprint(path):
+      return copy
+  return path
+
+def load_df(path, columns = None):
+  source = source_path(path)
+  if source != path or path.endswith(tuple(FORMATS.values())):
+    return read_columnar(source, columns)
+  if path in SCHEMAS:
+    # same dtypes as the columnar copy
+    return read_typed_csv(path, SCHEMAS[path], columns)
+  return pd.read_csv(path, usecols = columns)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Write typed columnar copies of the csv files in data/')
+  parser.add_argument('--format', choices = list(FORMATS), default = 'feather')
+  args = parser.parse_args()
+  for csv_path, schema in SCHEMAS.items():
+    print(f'{csv_path} -> {convert(csv_path, schema, args.format)}')
@@ -0,0 +1,136 @@
+import argparse
+
+import numpy as np
+from joblib import load
+
+#------------------------------ Compiled decision tree ----------------------------------
+# The fitted DecisionTreeClassifier is exported to flat arrays (feature, threshold,
+# left/right child, leaf class). Leaves point to themselves, so a batch can be evaluated
+# by stepping every row max_depth times with np.where and no per-row branching.
+# With few features the tree is further folded into a lookup table: each feature only
+# matters through the interval its value falls in between that feature's thresholds, so
+# the leaf class is tabulated once per combination of intervals.
+# Rows are cast to float32 before comparing, exactly like sklearn's tree predict.
+MAX_TABLE_SIZE = 1 << 22
+
+class TreePredictor:
+  def __init__(self, feature, threshold, left, right, leaf_class, max_depth, feature_names = None):
+    self.feature = np.asarray(feature, dtype = np.intp)
+    self.threshold = np.asarray(threshold, dtype = np.float64)
+    self.left = np.asarray(left, dtype = np.intp)
+    self.right = np.asarray(right, dtype = np.intp)
+    self.leaf_class = np.asarray(leaf_class)
+    self.max_depth = int(max_depth)
+    self.feature_names = None if feature_names is None else list(feature_names)
+    # python lists make the single-row walk cheaper than numpy scalar indexing
+    self._nodes = list(zip(self.feature.tolist(), self.threshold.tolist(),
+                           self.left.tolist(), self.right.tolist()))
+    self._classes = self.leaf_class.tolist()
+    self._build_table()
+
+  def _build_table(self):
+    n_features = int(self.feature.max()) + 1
+    split = self.left != np.arange(len(self.left))
+    self.cuts = [np.unique(self.threshold[split & (self.feature == f)]) for f in range(n_features)]
+    # for a float32 x, x <= t is the same test as x <= (largest float32 not above t)
+    self.cuts32 = []
+    for cuts in self.cuts:
+      cuts32 = cuts.astype(np.float32)
+      above = cuts32.astype(np.float64) > cuts
+      cuts32[above] = np.nextafter(cuts32[above], np.float32(-np.inf))
+      self.cuts32.append(cuts32)
+    shape = tuple(len(c) + 1 for c in self.cuts)
+    if np.prod(shape, dtype = np.float64) > MAX_TABLE_SIZE:
+      self.table = None
+      return
+    # interval i of a feature is (cuts[i - 1], cuts[i]]; cuts[i] itself represents it
+    reps = [np.append(c, np.inf) for c in self.cuts]
+    grid = np.meshgrid(*reps, indexing = 'ij')
+    cells = np.column_stack([g.ravel() for g in grid])
+    self.table = self._walk(cells).reshape(shape)
+
+  @classmethod
+  def from_sklearn(cls, clf):
+    tree = clf.tree_
+    nodes = np.arange(tree.node_count)
+    is_leaf = tree.children_left == -1
+    left = np.where(is_leaf, nodes, tree.children_left)
+    right = np.where(is_leaf, nodes, tree.children_right)
+    feature = np.where(is_leaf, 0, tree.feature)
+    threshold = np.where(is_leaf, np.inf, tree.threshold)
+    leaf_class = clf.classes_[np.argmax(tree.value[:, 0, :], axis = 1)]
+    return cls(feature, threshold, left, right, leaf_class, tree.max_depth,
+               getattr(clf, 'feature_names_in_', None))
+
+  @classmethod
+  def load(cls, path):
+    arrays = np.load(path, allow_pickle = False)
+    names = arrays['feature_names'].tolist() if 'feature_names' in arrays else None
+    return cls(arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'],
+               arrays['leaf_class'], arrays['max_depth'], names)
+
+  def save(self, path):
+    arrays = dict(feature = self.feature.astype(np.int32), threshold = self.threshold,
+                  left = self.left.astype(np.int32), right = self.right.astype(np.int32),
+                  leaf_class = self.leaf_class, max_depth = np.int32(self.max_depth))
+    if self.feature_names is not None:
+      arrays['feature_names'] = np.array(self.feature_names)
+    np.savez(path, **arrays)
+
+  def _matrix(self, X):
+    if self.feature_names is not None and hasattr(X, 'columns'):
+      X = X[self.feature_names]
+    return np.asarray(X, dtype = np.float32)
+
+  def _columns(self, X):
+    if hasattr(X, 'columns'):
+      names = self.feature_names or list(X.columns)
+      return [X[name].to_numpy(dtype = np.float32) for name in names]
+    X = np.asarray(X)
+    return [X[:, f].astype(np.float32) for f in range(X.shape[1])]
+
+  # number of cuts below each value; counting comparisons beats a binary search
+  # over a handful of cuts
+  @staticmethod
+  def _interval(x, cuts32):
+    if len(cuts32) > 254:
+      return np.searchsorted(cuts32, x, side = 'left')
+    out = np.zeros(len(x), dtype = np.uint8)
+    above = np.empty(len(x), dtype = bool)
+    for cut in cuts32:
+      np.greater(x, cut, out = above)
+      out += above
+    return out
+
+  def predict(self, X):
+    if self.table is None:
+      return self._walk(self._matrix(X))
+    cols = self._columns(X)
+    return self.table[tuple(self._interval(x, cuts) for x, cuts in zip(cols, self.cuts32))]
+
+  def _walk(self, X):
+    rows = np.arange(len(X))
+    node = np.zeros(len(X), dtype = np.intp)
+    for _ in range(self.max_depth):
+      go_left = X[rows, self.feature[node]] <= self.threshold[node]
+      node = np.where(go_left, self.left[node], self.right[node])
+    return self.leaf_class[node]
+
+  # one customer as a sequence of feature values, in feature order
+  def predict_row(self, values):
+    values = [float(np.float32(v)) for v in values]
+    node = 0
+    while True:
+      feature, threshold, left, right = self._nodes[node]
+      nxt = left if values[feature] <= threshold else right
+      if nxt == node:
+        return self._classes[node]
+      node = nxt
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Export a fitted decision tree to flat numpy arrays')
+  parser.add_argument('model', nargs = '?', default = 'Saved_models/DC_rmf.joblib')
+  parser.add_argument('output', nargs = '?', default = 'Saved_models/DC_rmf_tree.npz')
+  args = parser.parse_args()
+  TreePredictor.from_sklearn(load(args.model)).save(args.output)
+  print(f'{args.model} exported to {args.output}')
@@ -0,0 +1,38 @@
+# Rows/sec of the batch scorer on resampled CDNOW customers.
+# Run from the repository root: python benchmarks/bench_batch_score.py --rows 2000000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+from batch_score import FEATURES, BatchScorer
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = 'data/RFM_data.csv')
+  parser.add_argument('--rows', type = int, default = 1_000_000)
+  parser.add_argument('--chunksize', type = int, default = 200_000)
+  args = parser.parse_args()
+
+  rfm_df = pd.read_csv(args.data, usecols = FEATURES)
+  idx = np.random.default_rng(0).integers(0, len(rfm_df), args.rows)
+  customers = rfm_df.iloc[idx].reset_index(drop = True)
+  tmp = tempfile.mkdtemp()
+  input_path = os.path.join(tmp, 'customers.csv')
+  customers.to_csv(input_path, index = False)
+
+  for compiled in [False, True]:
+    scorer = BatchScorer(compiled = compiled)
+    engine = 'compiled tree' if compiled else 'clf.predict'
+    rows, seconds = scorer.score_file(input_path, os.path.join(tmp, 'scored.csv'), chunksize = args.chunksize)
+    print(f'[{engine}] csv end to end: {rows} rows in {seconds:.2f}s ({rows / seconds:,.0f} rows/sec)')
+    for name, func in [('predict only', scorer.predict), ('predict + labels', scorer.score)]:
+      start = time.perf_counter()
+      func(customers)
+      seconds = time.perf_counter() - start
+      print(f'[{engine}] {name}: {args.rows / seconds:,.0f} rows/sec')
@@ -0,0 +1,53 @@
+# Full-batch KMeans vs MiniBatchKMeans fed from chunks: throughput and inertia.
+# Run from the repository root: python benchmarks/bench_clustering.py --rows 1000000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn import preprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+from clustering import ClusteringBackend, read_chunks
+
+COLS = ['Recency', 'Frequency', 'Monetary']
+
+# scaled CDNOW rows resampled with a little noise up to the requested size
+def scaled_rows(path, rows, seed = 0):
+  df = pd.read_csv(path, usecols = COLS)
+  scaled = preprocessing.RobustScaler().fit_transform(np.log1p(df))
+  rng = np.random.default_rng(seed)
+  sample = scaled[rng.integers(0, len(scaled), rows)]
+  return (sample + rng.normal(scale = 0.01, size = sample.shape)).astype(np.float32)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = 'data/RFM_data.csv')
+  parser.add_argument('--rows', type = int, default = 1_000_000)
+  parser.add_argument('--chunksize', type = int, default = 200_000)
+  args = parser.parse_args()
+
+  data = scaled_rows(args.data, args.rows)
+  csv_path = os.path.join(tempfile.mkdtemp(), 'scaled_rfm.csv')
+  pd.DataFrame(data, columns = COLS).to_csv(csv_path, index = False)
+
+  runs = {
+    'kmeans (in memory)' : lambda: ClusteringBackend('kmeans', seed = 0).fit(data),
+    'minibatch (array chunks)' : lambda: ClusteringBackend('minibatch', seed = 0).fit(data),
+    'minibatch (csv chunks)' : lambda: ClusteringBackend('minibatch', seed = 0).fit(
+      lambda: read_chunks(csv_path, COLS, chunksize = args.chunksize)),
+  }
+  rows = []
+  for name, fit in runs.items():
+    start = time.perf_counter()
+    model = fit()
+    elapsed = time.perf_counter() - start
+    rows.append({'Backend' : name, 'Seconds' : elapsed, 'RowsPerSec' : args.rows / elapsed,
+                 'Inertia' : model.inertia(data)})
+  report = pd.DataFrame(rows)
+  report['InertiaVsFull'] = report['Inertia'] / report['Inertia'].iloc[0]
+  print(f'rows: {args.rows}')
+  print(report.round(3).to_string(index = False))
@@ -0,0 +1,63 @@
+# Hit/miss timings of the rendered figure cache against what st.cache_data did per call:
+# hash the whole input frame and unpickle the cached Figure.
+# Run from the repository root: python benchmarks/bench_figure_cache.py --scales 1 10
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+from figure_cache import FigureCache, frame_fingerprint
+from large_plots import segment_scatter
+from rfm_rules import label_rfm
+
+def timed(fn, repeat = 5):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    out = fn()
+  return (time.perf_counter() - start) / repeat, out
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = 'data/RFM_data.csv')
+  parser.add_argument('--scales', type = int, nargs = '+', default = [1, 10])
+  args = parser.parse_args()
+
+  rfm_df = pd.read_csv(args.data)
+  rfm_df['RFM_label'] = label_rfm(rfm_df)
+  print(f'{"rows":>10s} {"step":28s} {"ms":>9s}')
+  for scale in args.scales:
+    df = rfm_df.iloc[np.tile(np.arange(len(rfm_df)), scale)].reset_index(drop = True)
+    with tempfile.TemporaryDirectory() as cache_dir:
+      cache = FigureCache(cache_dir)
+      render = lambda: cache.png('scatter_plot', segment_scatter, data = df, label = 'RFM_label')
+      miss, png = timed(render, repeat = 1)
+      hit, _ = timed(render)
+      fingerprint, _ = timed(lambda: frame_fingerprint(df))
+      by_version = lambda: cache.png('scatter_plot', segment_scatter, data = df, version = 'v1', label = 'RFM_label')
+      by_version()
+      version_hit, _ = timed(by_version)
+    fig = segment_scatter(df, 'RFM_label')
+    pickled = pickle.dumps(fig)
+    plt.close(fig)
+    full_hash, _ = timed(lambda: pd.util.hash_pandas_object(df).sum())
+    unpickle, _ = timed(lambda: plt.close(pickle.loads(pickled)))
+    rows = [
+      ('miss (render + png)', miss),
+      ('hit, fingerprint key', hit),
+      ('  of which fingerprint', fingerprint),
+      ('hit, version key', version_hit),
+      ('st.cache_data: hash frame', full_hash),
+      ('st.cache_data: unpickle fig', unpickle),
+    ]
+    for step, seconds in rows:
+      print(f'{len(df):10d} {step:28s} {seconds * 1000:9.2f}')
+    print(f'{len(df):10d} {"png / pickled figure KB":28s} {len(png) / 1024:9.0f} / {len(pickled) / 1024:.0f}')
@@ -0,0 +1,52 @@
+# Sequential k_best_plot loop vs the parallel sweep engine.
+# Run from the repository root: python benchmarks/bench_k_sweep.py
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn import preprocessing
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+from k_sweep import sweep_k
+
+def scaled_rfm(path):
+  df = pd.read_csv(path, usecols = ['Recency', 'Frequency', 'Monetary'])
+  return preprocessing.RobustScaler().fit_transform(np.log1p(df))
+
+# previous loop from k_best_plot
+def sequential_sweep(data):
+  rows = []
+  for k in range(2, 10):
+    kmeans = KMeans(n_clusters = k, n_init = 10, random_state = 0)
+    kmeans.fit(data)
+    rows.append({'K' : k, 'WSSE' : kmeans.inertia_ / data.shape[0],
+                 'Silhouette' : silhouette_score(data, kmeans.labels_)})
+  return pd.DataFrame(rows)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = 'data/RFM_data.csv')
+  parser.add_argument('--skip-sequential', action = 'store_true')
+  args = parser.parse_args()
+  data = scaled_rfm(args.data)
+
+  runs = [] if args.skip_sequential else [('sequential, full silhouette', lambda: sequential_sweep(data))]
+  for mode in ['full', 'sample', 'simplified']:
+    runs.append((f'parallel, {mode} silhouette', lambda mode = mode: sweep_k(data, silhouette = mode, cache_dir = None)))
+  results = {}
+  for name, func in runs:
+    start = time.perf_counter()
+    results[name] = func()
+    print(f'{name:32s} {time.perf_counter() - start:8.2f}s')
+  print(pd.concat(results, axis = 1).round(3).to_string())
+
+  cache_dir = os.path.join('.cache', 'bench_k_sweep')
+  for attempt in ['miss', 'hit']:
+    start = time.perf_counter()
+    sweep_k(data, cache_dir = cache_dir)
+    print(f'cache {attempt}: {time.perf_counter() - start:.3f}s')
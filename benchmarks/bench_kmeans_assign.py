@@ -0,0 +1,57 @@
+# Rows/sec and peak traced memory of nearest-centroid assignment (KMeansArtifact.assign)
+# against KMeans.predict on the scaled frame, with a parity check on resampled CDNOW
+# customers and on uniform random values. Exits non-zero on any mismatch: the repo has
+# no test suite, so this script is the parity test for assign; run it after changing
+# kmeans_artifact.py or rfm_scaler.py.
+# Run from the repository root: python benchmarks/bench_kmeans_assign.py --rows 5000000
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+from kmeans_artifact import MODEL_PATH, KMeansArtifact
+from rfm_scaler import FEATURES
+
+def measure(fn):
+  tracemalloc.start()
+  start = time.perf_counter()
+  out = fn()
+  seconds = time.perf_counter() - start
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return out, seconds, peak / 2**20
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = 'data/RFM_data.csv')
+  parser.add_argument('--model', default = MODEL_PATH)
+  parser.add_argument('--rows', type = int, default = 2_000_000)
+  parser.add_argument('--chunksize', type = int, default = 65_536)
+  args = parser.parse_args()
+
+  kmeans = KMeansArtifact.load(args.model)
+  rfm_df = pd.read_csv(args.data, usecols = FEATURES)
+  rng = np.random.default_rng(0)
+  cases = {
+    'resampled': rfm_df.iloc[rng.integers(0, len(rfm_df), args.rows)].reset_index(drop = True),
+    'uniform': pd.DataFrame({'Recency' : rng.integers(0, 600, args.rows),
+                             'Frequency' : rng.integers(1, 100, args.rows),
+                             'Monetary' : rng.uniform(0, 5000, args.rows)}),
+  }
+  mismatches = 0
+  print(f'{"data":10s} {"method":16s} {"M rows/s":>9s} {"peak MB":>8s}')
+  for name, df in cases.items():
+    expected, seconds, peak = measure(lambda: kmeans.predict(df))
+    print(f'{name:10s} {"KMeans.predict":16s} {len(df) / seconds / 1e6:9.1f} {peak:8.1f}')
+    labels, seconds, peak = measure(lambda: kmeans.assign(df, chunksize = args.chunksize))
+    print(f'{name:10s} {"assign":16s} {len(df) / seconds / 1e6:9.1f} {peak:8.1f}')
+    diff = int((labels != expected).sum())
+    print(f'{name:10s} {"mismatches":16s} {diff:9d}')
+    mismatches += diff
+  if mismatches:
+    sys.exit(f'{mismatches} rows assigned differently from KMeans.predict')
@@ -0,0 +1,110 @@
+# Memory report for the customer table held by the app: the former default-dtype frames
+# (int64/float64 values, object RFM_label, full copies from rfm_labeling, extract_cols
+# and kmeans_model, each kept as an st.cache_data entry and unpickled again for every
+# session) against the compact shared table of customer_table.py (views, one
+# st.cache_resource entry). Each layout and size runs in a fresh interpreter; the report
+# gives the RSS held by the caches and the RSS each extra session adds, and the compact
+# run asserts that its views share every column with the table.
+# Run from the repository root: python benchmarks/bench_memory.py --scales 1 10 100
+import argparse
+import gc
+import json
+import os
+import pickle
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'GUI'))
+from instrumentation import rss_bytes
+
+FEATURES = ['Recency', 'Frequency', 'Monetary']
+LAYOUTS = ('default', 'compact')
+
+def tiled_csv(workdir, scale, source = 'data/RFM_data.csv'):
+  path = os.path.join(workdir, f'rfm_x{scale}.csv')
+  if not os.path.exists(path):
+    rfm = pd.read_csv(source)
+    rfm.iloc[np.tile(np.arange(len(rfm)), scale)].to_csv(path, index = False)
+    from storage import RFM_SCHEMA, convert
+    convert(path, RFM_SCHEMA)
+  return path
+
+# the objects one page run holds, from the shared cache entries
+def default_pages(path, kmeans):
+  from rfm_rules import label_rfm
+  rfm_df = pd.read_csv(path)
+  rfm_df['RFM_label'] = label_rfm(rfm_df)
+  df = pd.read_csv(path, usecols = FEATURES)
+  scale_df = pd.DataFrame(kmeans.transform(df), columns = FEATURES)
+  k_df = df.copy()
+  k_df['K_label'] = kmeans.predict(df)
+  # st.cache_data keeps pickled values and returns a fresh copy on every call
+  entries = [pickle.dumps(x, protocol = pickle.HIGHEST_PROTOCOL) for x in (rfm_df, df, scale_df, k_df)]
+  return entries, lambda: [pickle.loads(e) for e in entries]
+
+def compact_pages(path, kmeans):
+  from customer_table import columns_view, load_customers, with_column
+  rfm_df = load_customers(path)
+  df = columns_view(rfm_df, FEATURES)
+  scale_df = pd.DataFrame(kmeans.transform(df), columns = FEATURES)
+  k_df = with_column(df, 'K_label', kmeans.assign(df).astype(np.uint8))
+  # the views must share every column with the table, or each session copies it again
+  for view in (df, k_df):
+    for col in FEATURES:
+      assert np.shares_memory(view[col].to_numpy(), rfm_df[col].to_numpy()), f'{col} was copied'
+  labelled = with_column(rfm_df, 'K_label', k_df['K_label'])
+  for col in rfm_df.columns.drop('RFM_label'):
+    assert np.shares_memory(labelled[col].to_numpy(), rfm_df[col].to_numpy()), f'{col} was copied'
+  # st.cache_resource returns the cached objects themselves
+  entries = [rfm_df, scale_df, k_df]
+  return entries, lambda: [columns_view(rfm_df, FEATURES)] + entries
+
+def run_child(layout, path, sessions):
+  from kmeans_artifact import KMeansArtifact
+  kmeans = KMeansArtifact.load()
+  gc.collect()
+  base = rss_bytes()
+  entries, page = (default_pages if layout == 'default' else compact_pages)(path, kmeans)
+  gc.collect()
+  shared = rss_bytes()
+  held = [page() for _ in range(sessions)]
+  gc.collect()
+  total = rss_bytes()
+  table = entries[0] if layout == 'compact' else held[0][0]
+  return {'layout' : layout, 'customers' : len(table),
+          'table_mb' : round(table.memory_usage(deep = True).sum() / 2**20, 2),
+          'cache_rss_mb' : round((shared - base) / 2**20, 1),
+          'session_rss_mb' : round((total - shared) / sessions / 2**20, 2)}
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--scales', type = int, nargs = '+', default = [1, 10, 100],
+                      help = 'copies of data/RFM_data.csv (23,446 customers each)')
+  parser.add_argument('--sessions', type = int, default = 4)
+  parser.add_argument('--workdir', default = '.cache/bench')
+  parser.add_argument('--output', help = 'also write the report as JSON')
+  parser.add_argument('--child', nargs = 2, metavar = ('LAYOUT', 'PATH'), help = argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.child:
+    print(json.dumps(run_child(args.child[0], args.child[1], args.sessions)))
+    sys.exit()
+
+  os.makedirs(args.workdir, exist_ok = True)
+  report = []
+  print(f'{"customers":>10s} {"layout":8s} {"table MB":>9s} {"cache RSS MB":>13s} {"RSS/session MB":>15s}')
+  for scale in args.scales:
+    path = tiled_csv(args.workdir, scale)
+    for layout in LAYOUTS:
+      cmd = [sys.executable, os.path.abspath(__file__), '--child', layout, path, '--sessions', str(args.sessions)]
+      out = subprocess.run(cmd, capture_output = True, text = True, check = True)
+      r = json.loads(out.stdout.strip().splitlines()[-1])
+      report.append(r)
+      print(f'{r["customers"]:10,d} {layout:8s} {r["table_mb"]:9.2f} {r["cache_rss_mb"]:13.1f} {r["session_rss_mb"]:15.2f}')
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent = 2)
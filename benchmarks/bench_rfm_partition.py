@@ -0,0 +1,53 @@
+# Wall time of rfm_builder.build_rfm (one process, streamed chunks) against
+# rfm_partition.build_rfm_partitioned with 1, 2, 4 ... workers on synthetic CDNOW-like
+# transactions, with a parity check: every partitioned table must equal build_rfm's.
+# Speedup is bounded by the cores of the machine (printed first).
+# Run from the repository root: python benchmarks/bench_rfm_partition.py --rows 5000000 --jobs 1 2 4 8
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'GUI'))
+sys.path.insert(0, HERE)
+from rfm_builder import build_rfm
+from rfm_partition import build_rfm_partitioned
+
+def timed(fn):
+  start = time.perf_counter()
+  out = fn()
+  return out, time.perf_counter() - start
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = None, help = 'transaction csv (default: synthetic)')
+  parser.add_argument('--rows', type = int, default = 2_000_000)
+  parser.add_argument('--jobs', type = int, nargs = '+', default = [1, 2, 4])
+  parser.add_argument('--split-mb', type = int, default = 16)
+  parser.add_argument('--workdir', default = '.cache/bench')
+  args = parser.parse_args()
+
+  path = args.data
+  if path is None:
+    os.makedirs(args.workdir, exist_ok = True)
+    path = os.path.join(args.workdir, f'transactions_{args.rows}_0.csv')
+    if not os.path.exists(path):
+      from synth_transactions import write
+      write(path, args.rows)
+  print(f'{path}: {os.path.getsize(path) / 2**20:.0f} MB, {os.cpu_count()} cores')
+  expected, base = timed(lambda: build_rfm(path))
+  print(f'{"build_rfm":24s} {base:8.2f} s')
+  failed = False
+  for jobs in args.jobs:
+    rfm, seconds = timed(lambda: build_rfm_partitioned(path, n_jobs = jobs, split_bytes = args.split_mb * 2**20))
+    try:
+      pd.testing.assert_frame_equal(rfm, expected, check_exact = True)
+      same = 'identical'
+    except AssertionError as e:
+      same, failed = f'DIFFERENT: {str(e).splitlines()[0]}', True
+    print(f'{f"partitioned, {jobs} jobs":24s} {seconds:8.2f} s {base / seconds:6.2f}x  {same}')
+  if failed:
+    sys.exit('partitioned RFM table differs from build_rfm')
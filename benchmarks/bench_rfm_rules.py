@@ -0,0 +1,68 @@
+# Row-wise apply vs compiled segment rules.
+# Run from the repository root: python benchmarks/bench_rfm_rules.py --scale 100
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+from rfm_rules import label_rfm, label_kmeans
+
+# previous row-wise implementations, kept here as the reference
+def rfm_label(df):
+  if df.R == 1 or df.R == 2:
+    return "Left"
+  elif (df.R == 3 or df.R == 4) and df.F != 4:
+    return "Regular"
+  elif (df.R == 3) and df.F == 4 and df.M == 4:
+    return "Leaving"
+  else:
+    return "Loyal"
+
+def labeling(df):
+  if df['K_label'] == 1:
+    return "Left"
+  elif df['K_label'] == 2:
+    return "Potential"
+  elif df['K_label'] == 3:
+    return "Star"
+  else:
+    return "Regular"
+
+def timed(func, *args):
+  start = time.perf_counter()
+  out = func(*args)
+  return out, time.perf_counter() - start
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = 'data/RFM_data.csv')
+  parser.add_argument('--scale', type = int, default = 1, help = 'replicate the data n times')
+  args = parser.parse_args()
+
+  rfm_df = pd.read_csv(args.data)
+  rfm_df = pd.concat([rfm_df] * args.scale, ignore_index = True)
+  rfm_df['K_label'] = np.random.default_rng(0).integers(0, 5, len(rfm_df))
+  print(f'rows: {len(rfm_df)}')
+
+  for name, slow, fast, arg in [
+      ('rfm_label', lambda df: df.apply(rfm_label, axis = 1), label_rfm, rfm_df),
+      ('labeling', lambda df: df.apply(labeling, axis = 1), lambda df: label_kmeans(df['K_label']), rfm_df)]:
+    expected, t_slow = timed(slow, arg)
+    result, t_fast = timed(fast, arg)
+    assert (expected.values == result.values).all(), f'{name}: labels differ'
+    print(f'{name:10s} apply: {t_slow:8.3f}s  vectorized: {t_fast:8.4f}s  speedup: {t_slow / t_fast:8.1f}x')
+
+  # scores outside 1..4 (and missing ones) take the np.select path, which must follow
+  # the if/elif chain as well
+  odd = pd.DataFrame(list(itertools.product([0, 1, 2, 3, 4, 5, np.nan], repeat = 3)), columns = ['R', 'F', 'M'])
+  assert (odd.apply(rfm_label, axis = 1).values == label_rfm(odd).values).all(), 'out-of-range labels differ'
+  print(f'{"rfm_label":10s} out-of-range scores: same labels for {len(odd)} combinations')
+  # fractional scores inside 1..4 must not be truncated onto the integer lookup cube
+  frac = pd.DataFrame(list(itertools.product([1, 1.5, 2, 2.5, 3, 3.5, 4], repeat = 3)), columns = ['R', 'F', 'M'])
+  assert (frac.apply(rfm_label, axis = 1).values == label_rfm(frac).values).all(), 'fractional labels differ'
+  print(f'{"rfm_label":10s} fractional scores: same labels for {len(frac)} combinations')
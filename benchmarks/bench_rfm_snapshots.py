@@ -0,0 +1,76 @@
+# Time for monthly RFM snapshots with RFMSnapshots (one sort, prefix aggregates, one
+# lookup per date) against recomputing each snapshot from the transactions up to its
+# date, with a parity check: every snapshot must equal the recomputed table, and the
+# last one must equal build_rfm's table. Exits non-zero on any difference.
+# Run from the repository root: python benchmarks/bench_rfm_snapshots.py --rows 2000000
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'GUI'))
+sys.path.insert(0, HERE)
+from rfm_builder import RFMAccumulator, TRANSACTION_DTYPES, aggregate_chunk, build_rfm, clean_transactions, score_rfm, to_days
+from rfm_snapshots import RFMSnapshots, to_day, transitions
+
+# build_rfm's aggregation on the transactions up to as_of
+def recompute(tx, days, as_of):
+  day = to_day(as_of)
+  rfm = RFMAccumulator().add(aggregate_chunk(clean_transactions(tx[days <= day]))).result(max_day = day)
+  return score_rfm(rfm)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = None, help = 'transaction csv (default: data/CDnow_MasterData.csv or synthetic with --rows)')
+  parser.add_argument('--rows', type = int, default = None)
+  parser.add_argument('--freq', default = 'M')
+  parser.add_argument('--workdir', default = '.cache/bench')
+  args = parser.parse_args()
+
+  path = args.data or 'data/CDnow_MasterData.csv'
+  if args.rows:
+    os.makedirs(args.workdir, exist_ok = True)
+    path = os.path.join(args.workdir, f'transactions_{args.rows}_0.csv')
+    if not os.path.exists(path):
+      from synth_transactions import write
+      write(path, args.rows)
+
+  start = time.perf_counter()
+  engine = RFMSnapshots.from_transactions(path)
+  build = time.perf_counter() - start
+  dates = engine.dates(args.freq)
+  start = time.perf_counter()
+  snapshots = engine.snapshots(dates)
+  lookups = time.perf_counter() - start
+  print(f'{path}: {len(dates)} snapshots')
+  print(f'{"engine build (one sort)":28s} {build:8.2f} s')
+  print(f'{"engine snapshots":28s} {lookups:8.2f} s  ({lookups / len(dates) * 1000:.1f} ms each)')
+
+  tx = pd.read_csv(path, dtype = TRANSACTION_DTYPES)
+  days = to_days(tx['date'])
+  start = time.perf_counter()
+  mismatches = 0
+  for date in dates:
+    expected = recompute(tx, days, date)
+    try:
+      pd.testing.assert_frame_equal(snapshots[date].drop(columns = 'RFM_label'), expected, check_exact = True)
+    except AssertionError as e:
+      print(f'{date.date()} differs: {str(e).splitlines()[0]}')
+      mismatches += 1
+  naive = time.perf_counter() - start
+  print(f'{"recompute per date":28s} {naive:8.2f} s  ({naive / (build + lookups):.1f}x slower)')
+  final = engine.at(engine.last_date).drop(columns = 'RFM_label')
+  try:
+    pd.testing.assert_frame_equal(final, build_rfm(path), check_exact = True)
+  except AssertionError as e:
+    print(f'last snapshot differs from build_rfm: {str(e).splitlines()[0]}')
+    mismatches += 1
+
+  (d0, d1), matrix = list(transitions(snapshots).items())[-1]
+  print(f'\nsegment transitions {d0.date()} -> {d1.date()}')
+  print(matrix.to_string())
+  if mismatches:
+    sys.exit(f'{mismatches} snapshots differ from the recomputed RFM tables')
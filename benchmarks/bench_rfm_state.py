@@ -0,0 +1,75 @@
+# Time for RFMStateStore.update applying many small deltas one by one against applying
+# them as one batch (one aggregation, one merge of each sorted key array), on a state
+# built from most of a synthetic transaction history. Parity check: both stores must
+# end with the same table, equal to build_rfm on the whole history. Deltas are split on
+# day boundaries, since build_rfm cleans duplicates across the whole file.
+# Run from the repository root: python benchmarks/bench_rfm_state.py --rows 2000000 --deltas 200
+import argparse
+import copy
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'GUI'))
+sys.path.insert(0, HERE)
+from rfm_builder import TRANSACTION_DTYPES, build_rfm, to_days
+from rfm_state import RFMStateStore
+
+def timed(fn):
+  start = time.perf_counter()
+  out = fn()
+  return out, time.perf_counter() - start
+
+def same(a, b):
+  try:
+    pd.testing.assert_frame_equal(a, b, check_exact = True)
+    return 'identical'
+  except AssertionError as e:
+    return f'DIFFERENT: {str(e).splitlines()[0]}'
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = None, help = 'transaction csv (default: synthetic)')
+  parser.add_argument('--rows', type = int, default = 2_000_000)
+  parser.add_argument('--deltas', type = int, default = 200)
+  parser.add_argument('--delta-share', type = float, default = 0.1, help = 'share of the days replayed as deltas')
+  parser.add_argument('--workdir', default = '.cache/bench')
+  args = parser.parse_args()
+
+  os.makedirs(args.workdir, exist_ok = True)
+  path = args.data
+  if path is None:
+    path = os.path.join(args.workdir, f'transactions_{args.rows}_0.csv')
+    if not os.path.exists(path):
+      from synth_transactions import write
+      write(path, args.rows)
+  tx = pd.read_csv(path, dtype = TRANSACTION_DTYPES)
+  days = to_days(tx['date'])
+  unique_days = np.unique(days)
+  replayed = unique_days[-max(args.deltas, int(len(unique_days) * args.delta_share)):]
+  base_path = os.path.join(args.workdir, f'state_base_{os.path.basename(path)}')
+  tx[days < replayed[0]].to_csv(base_path, index = False)
+  groups = np.array_split(replayed, args.deltas)
+  deltas = [tx[(days >= g[0]) & (days <= g[-1])] for g in groups]
+
+  base, seconds = timed(lambda: RFMStateStore.from_transactions(base_path))
+  print(f'{path}: {len(base.state):,d} customers in the state, {len(deltas)} deltas '
+        f'of {sum(map(len, deltas)) / len(deltas):,.0f} transactions on average')
+  print(f'{"build state":24s} {seconds:8.2f} s')
+  one_by_one, batch = copy.deepcopy(base), copy.deepcopy(base)
+  _, per_delta = timed(lambda: [one_by_one.update(delta) for delta in deltas])
+  print(f'{"update per delta":24s} {per_delta:8.2f} s  ({per_delta / len(deltas) * 1000:.1f} ms each)')
+  _, batched = timed(lambda: batch.update(*deltas))
+  print(f'{"update as one batch":24s} {batched:8.2f} s  ({per_delta / batched:.1f}x faster)')
+
+  expected = build_rfm(path)
+  checks = {'batch vs per delta' : same(batch.table(), one_by_one.table()),
+            'batch vs build_rfm' : same(batch.table().drop(columns = 'RFM_label'), expected)}
+  for name, result in checks.items():
+    print(f'{name:24s} {result}')
+  if any(result != 'identical' for result in checks.values()):
+    sys.exit('state store tables differ')
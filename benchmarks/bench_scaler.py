@@ -0,0 +1,56 @@
+# Time and peak traced memory of the former robust_scale (copy, three log columns, slice,
+# RobustScaler refit) against the fitted float32 LogRobustScaler, plus a parity check.
+# Run from the repository root: python benchmarks/bench_scaler.py --scales 1 10 100
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn import preprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+from rfm_scaler import LogRobustScaler
+
+def robust_scale(df):
+  log_features = df.copy()
+  log_features['R_log'] = np.log1p(log_features['Recency'])
+  log_features['F_log'] = np.log1p(log_features['Frequency'])
+  log_features['M_log'] = np.log1p(log_features['Monetary'])
+  features = log_features[['R_log', 'F_log', 'M_log']]
+  scaled = preprocessing.RobustScaler().fit_transform(features)
+  return pd.DataFrame(scaled, columns = df.columns.values.tolist())
+
+def measure(fn):
+  tracemalloc.start()
+  start = time.perf_counter()
+  out = fn()
+  seconds = time.perf_counter() - start
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return out, seconds, peak / 2**20
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = 'data/RFM_data.csv')
+  parser.add_argument('--scales', type = int, nargs = '+', default = [1, 10, 100])
+  args = parser.parse_args()
+
+  rfm_df = pd.read_csv(args.data, usecols = ['Recency', 'Frequency', 'Monetary'])
+  scaler = LogRobustScaler().fit(rfm_df)
+  reference = preprocessing.RobustScaler().fit(np.log1p(rfm_df.to_numpy(dtype = np.float64)))
+  print(f'{"rows":>10s} {"method":16s} {"ms":>9s} {"peak MB":>8s}')
+  for scale in args.scales:
+    df = rfm_df.iloc[np.tile(np.arange(len(rfm_df)), scale)].reset_index(drop = True)
+    _, seconds, peak = measure(lambda: robust_scale(df))
+    print(f'{len(df):10d} {"robust_scale":16s} {seconds * 1000:9.1f} {peak:8.1f}')
+    values = df.to_numpy(dtype = np.float32)
+    after, seconds, peak = measure(lambda: scaler.transform(values, copy = False))
+    print(f'{len(df):10d} {"fitted, in place":16s} {seconds * 1000:9.1f} {peak:8.1f}')
+    # same fit applied by sklearn in float64
+    error = np.abs(after - reference.transform(np.log1p(df.to_numpy(dtype = np.float64)))).max()
+    print(f'{len(df):10d} {"max abs diff":16s} {error:9.2e}')
+    if error > 1e-5:
+      sys.exit('fitted scaler does not match RobustScaler on log1p values')
@@ -0,0 +1,61 @@
+# Render time and peak traced memory of scatter_plot modes as customer counts grow.
+# Also checks that the density raster bins a constant column into its middle row.
+# Run from the repository root: python benchmarks/bench_scatter.py --scales 1 10 100
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+from large_plots import density_plot, segment_scatter
+from rfm_rules import label_rfm
+
+def render(df, mode):
+  tracemalloc.start()
+  start = time.perf_counter()
+  fig = segment_scatter(df, 'RFM_label', mode = mode)
+  fig.savefig(io.BytesIO(), format = 'png')
+  seconds = time.perf_counter() - start
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  plt.close(fig)
+  return seconds, peak / 2**20
+
+# every customer with the same Recency used to give a zero-width range, i.e. 0/0 bin
+# indices; widened, the constant lands in the middle row of bins
+def check_constant_column(df):
+  df = df.assign(Recency = 42)
+  fig, ax = plt.subplots()
+  with np.errstate(divide = 'raise', invalid = 'raise'):
+    density_plot(ax, df, 'Monetary', 'Recency', 'RFM_label', 'Spectral', bins = (30, 20))
+  alpha = ax.images[0].get_array()[..., 3]
+  plt.close(fig)
+  occupied = np.flatnonzero(alpha.any(axis = 1)).tolist()
+  assert occupied == [10], f'constant Recency binned into rows {occupied}'
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = 'data/RFM_data.csv')
+  parser.add_argument('--scales', type = int, nargs = '+', default = [1, 10, 100])
+  parser.add_argument('--full-limit', type = int, default = 300_000, help = 'skip full rendering above this')
+  args = parser.parse_args()
+
+  rfm_df = pd.read_csv(args.data)
+  rfm_df['RFM_label'] = label_rfm(rfm_df)
+  check_constant_column(rfm_df)
+  print(f'{"rows":>10s} {"mode":8s} {"seconds":>8s} {"peak MB":>8s}')
+  for scale in args.scales:
+    df = rfm_df.iloc[np.tile(np.arange(len(rfm_df)), scale)]
+    for mode in ['full', 'sample', 'density']:
+      if mode == 'full' and len(df) > args.full_limit:
+        continue
+      seconds, peak = render(df, mode)
+      print(f'{len(df):10d} {mode:8s} {seconds:8.2f} {peak:8.1f}')
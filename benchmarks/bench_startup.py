@@ -0,0 +1,70 @@
+# Cold start of the app: import time (python -X importtime) and time to first render of the
+# landing page, each in a fresh interpreter. --ref compares against the app at a git revision.
+# Run from the repository root: python benchmarks/bench_startup.py --ref HEAD~1
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+APP = os.path.join(ROOT, 'GUI', 'CustomerSegmentation_GUI.py')
+ENV = dict(os.environ, PYTHONPATH = os.path.join(ROOT, 'GUI'))
+
+RENDER = '''
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout = 600)
+at.run()
+print(json.dumps({{'seconds' : time.perf_counter() - start, 'exceptions' : len(at.exception)}}))
+'''
+
+# the app runs top to bottom outside `streamlit run`, which is enough to see what it imports
+def import_profile(app):
+  start = time.perf_counter()
+  out = subprocess.run([sys.executable, '-X', 'importtime', app], cwd = ROOT, env = ENV,
+                       capture_output = True, text = True)
+  wall = time.perf_counter() - start
+  packages = {}
+  for line in out.stderr.splitlines():
+    if not line.startswith('import time:') or 'cumulative' in line:
+      continue
+    self_us, _, name = line[len('import time:'):].split('|')
+    top = name.strip().split('.')[0]
+    packages[top] = packages.get(top, 0) + int(self_us)
+  return wall, packages
+
+def first_render(app):
+  out = subprocess.run([sys.executable, '-c', RENDER.format(app = app)], cwd = ROOT, env = ENV,
+                       capture_output = True, text = True, check = True)
+  return json.loads(out.stdout.splitlines()[-1])
+
+def report(name, app, top):
+  wall, packages = import_profile(app)
+  render = first_render(app)
+  print(f'{name}: script {wall:.2f} s, imports {sum(packages.values()) / 1e6:.2f} s, '
+        f'first render {render["seconds"]:.2f} s ({render["exceptions"]} exceptions)')
+  for package, us in sorted(packages.items(), key = lambda kv: -kv[1])[:top]:
+    print(f'  {package:24s} {us / 1000:8.1f} ms')
+  return packages
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--ref', help = 'git revision to compare against, e.g. HEAD~1')
+  parser.add_argument('--top', type = int, default = 10, help = 'slowest packages to list')
+  args = parser.parse_args()
+
+  if args.ref:
+    source = subprocess.run(['git', 'show', f'{args.ref}:GUI/CustomerSegmentation_GUI.py'], cwd = ROOT,
+                            capture_output = True, check = True).stdout
+    with tempfile.NamedTemporaryFile(suffix = '.py') as f:
+      f.write(source)
+      f.flush()
+      before = report(args.ref, f.name, args.top)
+  after = report('working tree', APP, args.top)
+  if args.ref:
+    dropped = sorted(set(before) - set(after), key = lambda package: -before[package])
+    print('not imported any more:', ', '.join(dropped[:args.top]))
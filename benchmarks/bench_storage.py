@@ -0,0 +1,46 @@
+# Load time and RSS of csv vs typed Feather/Parquet copies (python GUI/storage.py first).
+# Each measurement runs in a fresh interpreter so peak RSS is not shared.
+# Run from the repository root: python benchmarks/bench_storage.py
+import json
+import os
+import subprocess
+import sys
+
+GUI = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI')
+
+PROBE = '''
+import json, resource, sys, time
+sys.path.insert(0, {gui!r})
+import pandas as pd
+from storage import load_df, read_columnar
+path, columns = {path!r}, {columns!r}
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+for _ in range({repeat}):
+  df = pd.read_csv(path, usecols = columns) if path.endswith('.csv') else read_columnar(path, columns)
+seconds = (time.perf_counter() - start) / {repeat}
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'seconds' : seconds, 'rss_mb' : (after - before) / 1024,
+                  'frame_mb' : df.memory_usage(deep = True).sum() / 2**20}}))
+'''
+
+def probe(path, columns = None, repeat = 5):
+  code = PROBE.format(gui = GUI, path = path, columns = columns, repeat = repeat)
+  out = subprocess.run([sys.executable, '-c', code], capture_output = True, text = True, check = True)
+  return json.loads(out.stdout)
+
+if __name__ == '__main__':
+  cases = [
+    ('CDnow_MasterData', None),
+    ('RFM_data', None),
+    ('RFM_data', ['Recency', 'Frequency', 'Monetary']),
+  ]
+  print(f'{"file":18s} {"columns":8s} {"format":8s} {"ms":>8s} {"rss MB":>8s} {"frame MB":>9s}')
+  for stem, columns in cases:
+    for ext in ['.csv', '.feather', '.parquet']:
+      path = os.path.join('data', stem + ext)
+      if not os.path.exists(path):
+        continue
+      r = probe(path, columns)
+      cols = 'RFM' if columns else 'all'
+      print(f'{stem:18s} {cols:8s} {ext[1:]:8s} {r["seconds"] * 1000:8.1f} {r["rss_mb"]:8.1f} {r["frame_mb"]:9.2f}')
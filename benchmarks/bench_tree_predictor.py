@@ -0,0 +1,59 @@
+# Parity and speed of the compiled tree against DecisionTreeClassifier.predict.
+# Run from the repository root: python benchmarks/bench_tree_predictor.py
+# Exits with an error if any prediction differs from clf.predict.
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import load
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+from tree_predictor import TreePredictor
+
+FEATURES = ['Recency', 'Frequency', 'Monetary']
+
+def per_call(func, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    func()
+  return (time.perf_counter() - start) / repeat
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--model', default = 'Saved_models/DC_rmf.joblib')
+  parser.add_argument('--tree', default = 'Saved_models/DC_rmf_tree.npz')
+  parser.add_argument('--data', default = 'data/RFM_data.csv')
+  parser.add_argument('--rows', type = int, default = 1_000_000)
+  args = parser.parse_args()
+
+  clf = load(args.model)
+  tree = TreePredictor.load(args.tree)
+  rfm_df = pd.read_csv(args.data, usecols = FEATURES)
+
+  # parity on the real data, on perturbed values and exactly on every threshold
+  rng = np.random.default_rng(0)
+  noisy = rfm_df * rng.uniform(0.5, 1.5, size = rfm_df.shape)
+  split = clf.tree_.feature >= 0
+  edges = pd.DataFrame(np.tile(rfm_df.median().values, (split.sum(), 1)), columns = FEATURES)
+  edges.values[np.arange(split.sum()), clf.tree_.feature[split]] = clf.tree_.threshold[split]
+  for name, df in [('RFM_data.csv', rfm_df), ('perturbed', noisy), ('thresholds', edges)]:
+    expected = clf.predict(df)
+    if not (tree.predict(df) == expected).all():
+      sys.exit(f'parity check failed on {name}')
+    rows = df.values[:500]
+    if [tree.predict_row(r) for r in rows] != expected[:500].tolist():
+      sys.exit(f'single-row parity check failed on {name}')
+  print('parity with clf.predict: ok')
+
+  row = rfm_df.iloc[[0]]
+  values = row.values[0]
+  print(f'single row  clf.predict: {per_call(lambda: clf.predict(row), 200) * 1e6:8.1f} us')
+  print(f'single row  predict_row: {per_call(lambda: tree.predict_row(values), 20000) * 1e6:8.1f} us')
+
+  big = rfm_df.iloc[rng.integers(0, len(rfm_df), args.rows)]
+  for name, func in [('clf.predict', clf.predict), ('TreePredictor', tree.predict)]:
+    seconds = per_call(lambda: func(big), 3)
+    print(f'batch {args.rows} {name:14s} {args.rows / seconds:14,.0f} rows/sec')
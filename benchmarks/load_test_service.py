@@ -0,0 +1,76 @@
+# Local load test for GUI/scoring_service.py: p50/p99 latency and QPS.
+# Run from the repository root. Without --external the service is started in-process;
+# with it, --host and --port point at an already running service.
+#   python benchmarks/load_test_service.py --clients 64 --seconds 10
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+
+async def client(host, port, bodies, deadline, latencies):
+  reader, writer = await asyncio.open_connection(host, port)
+  i = 0
+  while time.perf_counter() < deadline:
+    body = bodies[i % len(bodies)]
+    i += 1
+    start = time.perf_counter()
+    writer.write(f'POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while True:
+      line = await reader.readline()
+      if line in (b'\r\n', b''):
+        break
+      if line.lower().startswith(b'content-length'):
+        length = int(line.split(b':')[1])
+    await reader.readexactly(length)
+    latencies.append(time.perf_counter() - start)
+  writer.close()
+
+async def load_test(host, port, clients, seconds, bodies):
+  latencies = []
+  deadline = time.perf_counter() + seconds
+  start = time.perf_counter()
+  await asyncio.gather(*[client(host, port, bodies[c::clients] or bodies, deadline, latencies)
+                         for c in range(clients)])
+  elapsed = time.perf_counter() - start
+  ms = np.array(latencies) * 1000
+  return {'clients' : clients, 'requests' : len(ms), 'qps' : len(ms) / elapsed,
+          'p50_ms' : np.percentile(ms, 50), 'p99_ms' : np.percentile(ms, 99)}
+
+async def main(args):
+  rfm_df = pd.read_csv(args.data, usecols = ['Recency', 'Frequency', 'Monetary'])
+  bodies = [json.dumps(row).encode() for row in rfm_df.head(5000).to_dict('records')]
+  host, port = args.host, args.port
+  server = None
+  if not args.external:
+    from scoring_service import ScoringService
+    service = ScoringService(window_ms = args.window_ms)
+    server = asyncio.create_task(service.serve(host, port))
+    await asyncio.sleep(0.5)
+  for clients in args.clients:
+    result = await load_test(host, port, clients, args.seconds, bodies)
+    print(json.dumps({k : round(v, 3) if isinstance(v, float) else v for k, v in result.items()}))
+  if server is not None:
+    server.cancel()
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--data', default = 'data/RFM_data.csv')
+  parser.add_argument('--host', default = '127.0.0.1')
+  parser.add_argument('--port', type = int, default = 8765)
+  parser.add_argument('--external', action = 'store_true', help = 'test an already running service')
+  parser.add_argument('--clients', type = int, nargs = '+', default = [1, 16, 64])
+  parser.add_argument('--seconds', type = float, default = 5)
+  parser.add_argument('--window-ms', type = float, default = 2.0)
+  args = parser.parse_args()
+  asyncio.run(main(args))
@@ -0,0 +1,210 @@
+# Benchmark suite for the segmentation pipeline on synthetic CDNOW-like transactions
+# (synth_transactions.py). Every stage runs in a fresh interpreter: inputs are loaded
+# first, then only the stage itself is timed, and peak RSS is read from getrusage.
+# Results are written as JSON; --baseline compares rows/sec against an earlier run and
+# exits non-zero when a stage got slower than --tolerance allows.
+# Run from the repository root:
+#   python benchmarks/run_benchmarks.py --rows 1000000 --output bench.json
+#   python benchmarks/run_benchmarks.py --rows 1000000 --baseline bench.json
+import argparse
+import importlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'GUI'))
+sys.path.insert(0, HERE)
+
+# stage name -> (what it measures, input it needs)
+STAGES = {
+  'build_rfm' : ('rfm_builder.build_rfm (scored) from the transaction csv', 'transactions'),
+  'build_rfm_partitioned' : ('rfm_partition.build_rfm_partitioned, one worker per core', 'transactions'),
+  'rfm_labeling' : ('rfm_rules.label_rfm', 'rfm'),
+  'robust_scale' : ('fitted log1p + RobustScaler transform', 'rfm'),
+  'k_sweep' : ('k_sweep.sweep_k for k = 2..9, no cache', 'scaled'),
+  'kmeans_train' : ('KMeansArtifact.train, offline', 'rfm'),
+  'kmeans_model' : ('KMeansArtifact.assign + customer_table.with_column as used by the app', 'rfm'),
+  'kmeans_assign' : ('KMeansArtifact.assign, chunked nearest centroid', 'rfm'),
+  'clf_predict' : ('DecisionTreeClassifier.predict', 'rfm'),
+  'tree_predict' : ('compiled TreePredictor.predict', 'rfm'),
+  'bubble_plot' : ('plots.bubble_plot', 'summary'),
+  'scatter_plot' : ('large_plots.segment_scatter + png', 'rfm'),
+  'qua_rev_plot' : ('plots.qua_rev_plot + png', 'summary'),
+  'dis_box_plot' : ('plots.dis_box_plot + png', 'rfm'),
+  'k_best_plot' : ('plots.k_best_plot + png, sweep already cached', 'scaled'),
+}
+FEATURES = ['Recency', 'Frequency', 'Monetary']
+
+def max_rss_mb():
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def png(fig):
+  import io
+  import matplotlib.pyplot as plt
+  fig.savefig(io.BytesIO(), format = 'png')
+  plt.close(fig)
+
+def transactions_path(workdir, rows, seed):
+  return os.path.join(workdir, f'transactions_{rows}_{seed}.csv')
+
+def rfm_path(workdir, rows, seed):
+  return os.path.join(workdir, f'rfm_{rows}_{seed}.feather')
+
+# returns (work, rows): work() runs the measured part, rows is what rows/sec counts
+def setup(stage, workdir, rows, seed):
+  import matplotlib
+  matplotlib.use('Agg')
+  import pandas as pd
+  from rfm_rules import label_rfm
+  from segment_summary import summarize
+  if stage == 'build_rfm_partitioned':
+    from rfm_partition import build_rfm_partitioned
+    return (lambda: build_rfm_partitioned(transactions_path(workdir, rows, seed), work_dir = workdir)), rows
+  if STAGES[stage][1] == 'transactions':
+    from rfm_builder import build_rfm
+    def work():
+      build_rfm(transactions_path(workdir, rows, seed)).reset_index(drop = True).to_feather(rfm_path(workdir, rows, seed))
+    return work, rows
+  rfm = pd.read_feather(rfm_path(workdir, rows, seed))
+  from kmeans_artifact import KMeansArtifact
+  kmeans = KMeansArtifact.load()
+  if stage == 'rfm_labeling':
+    return (lambda: label_rfm(rfm)), len(rfm)
+  if stage == 'robust_scale':
+    values = rfm[FEATURES]
+    return (lambda: kmeans.transform(values)), len(rfm)
+  if stage == 'kmeans_train':
+    return (lambda: KMeansArtifact.train(rfm[FEATURES])), len(rfm)
+  if stage == 'kmeans_model':
+    import numpy as np
+    from customer_table import columns_view, with_column
+    values = columns_view(rfm, FEATURES)
+    return (lambda: with_column(values, 'K_label', kmeans.assign(values).astype(np.uint8))), len(rfm)
+  if stage == 'kmeans_assign':
+    return (lambda: kmeans.assign(rfm)), len(rfm)
+  if stage in ('clf_predict', 'tree_predict'):
+    from batch_score import BatchScorer
+    scorer = BatchScorer(compiled = stage == 'tree_predict')
+    return (lambda: scorer.predict(rfm)), len(rfm)
+  if stage == 'scatter_plot':
+    from large_plots import segment_scatter
+    rfm['RFM_label'] = label_rfm(rfm)
+    return (lambda: png(segment_scatter(rfm, 'RFM_label'))), len(rfm)
+  import plots
+  # plotting libraries are imported lazily by plots.py, keep that out of the timing
+  for module in ('plotly.express', 'seaborn'):
+    importlib.import_module(module)
+  if STAGES[stage][1] == 'summary':
+    rfm['RFM_label'] = label_rfm(rfm)
+    summary = summarize(rfm, 'RFM_label')
+    if stage == 'bubble_plot':
+      from segment_summary import aggregation_table
+      return (lambda: plots.bubble_plot(aggregation_table(summary, 'RFM_label'), 'RFM_label')), len(rfm)
+    return (lambda: png(plots.qua_rev_plot(summary, 'RFM_label', 'Spectral', 'Blues'))), len(rfm)
+  if stage == 'dis_box_plot':
+    return (lambda: png(plots.dis_box_plot(rfm[FEATURES]))), len(rfm)
+  from k_sweep import sweep_k
+  scaled = pd.DataFrame(kmeans.transform(rfm), columns = FEATURES)
+  if stage == 'k_sweep':
+    return (lambda: sweep_k(scaled, cache_dir = None)), len(rfm)
+  # k_best_plot: fill the sweep cache outside the measurement
+  sweep_k(scaled)
+  return (lambda: png(plots.k_best_plot(scaled))), len(rfm)
+
+def run_child(stage, workdir, rows, seed):
+  work, n = setup(stage, workdir, rows, seed)
+  before = max_rss_mb()
+  start = time.perf_counter()
+  work()
+  seconds = time.perf_counter() - start
+  peak = max_rss_mb()
+  return {'stage' : stage, 'rows' : n, 'seconds' : round(seconds, 4),
+          'rows_per_sec' : round(n / seconds, 1), 'peak_rss_mb' : round(peak, 1),
+          'rss_growth_mb' : round(peak - before, 1)}
+
+def run_stage(stage, workdir, rows, seed):
+  cmd = [sys.executable, os.path.abspath(__file__), '--child', stage, '--workdir', workdir,
+         '--rows', str(rows), '--seed', str(seed)]
+  out = subprocess.run(cmd, capture_output = True, text = True)
+  if out.returncode != 0:
+    return {'stage' : stage, 'error' : out.stderr.strip().splitlines()[-1]}
+  return json.loads(out.stdout.strip().splitlines()[-1])
+
+def metadata(args):
+  import numpy as np
+  import pandas as pd
+  import sklearn
+  try:
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True).stdout.strip()
+  except OSError:
+    commit = None
+  return {'transactions' : args.rows, 'seed' : args.seed, 'commit' : commit,
+          'python' : platform.python_version(), 'numpy' : np.__version__, 'pandas' : pd.__version__,
+          'sklearn' : sklearn.__version__, 'cpus' : os.cpu_count(), 'machine' : platform.machine()}
+
+# stages slower than the baseline by more than tolerance (on the same input size)
+def regressions(results, baseline, tolerance):
+  old = dict((r['stage'], r) for r in baseline['results'] if 'error' not in r)
+  slower = []
+  for r in results:
+    ref = old.get(r['stage'])
+    if ref is None or 'error' in r or ref['rows'] != r['rows']:
+      continue
+    if r['rows_per_sec'] < ref['rows_per_sec'] * (1 - tolerance):
+      slower.append((r['stage'], ref['rows_per_sec'], r['rows_per_sec']))
+  return slower
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Benchmark the segmentation pipeline')
+  parser.add_argument('--rows', type = int, default = 1_000_000, help = 'synthetic transactions')
+  parser.add_argument('--seed', type = int, default = 0)
+  parser.add_argument('--stages', nargs = '+', choices = list(STAGES), default = list(STAGES))
+  parser.add_argument('--workdir', default = '.cache/bench', help = 'generated inputs are kept here')
+  parser.add_argument('--output', help = 'write the JSON report here (default: stdout)')
+  parser.add_argument('--baseline', help = 'JSON report to compare against')
+  parser.add_argument('--tolerance', type = float, default = 0.25, help = 'allowed rows/sec drop')
+  parser.add_argument('--child', choices = list(STAGES), help = argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.child:
+    print(json.dumps(run_child(args.child, args.workdir, args.rows, args.seed)))
+    sys.exit()
+
+  os.makedirs(args.workdir, exist_ok = True)
+  path = transactions_path(args.workdir, args.rows, args.seed)
+  if not os.path.exists(path):
+    from synth_transactions import write
+    write(path, args.rows, args.seed)
+  # every other stage reads the RFM table written by build_rfm
+  stages = args.stages
+  if 'build_rfm' not in stages and not os.path.exists(rfm_path(args.workdir, args.rows, args.seed)):
+    stages = ['build_rfm'] + stages
+  results = []
+  for stage in stages:
+    result = run_stage(stage, args.workdir, args.rows, args.seed)
+    results.append(result)
+    if 'error' in result:
+      print(f'{stage:21s} failed: {result["error"]}', file = sys.stderr)
+    else:
+      print(f'{stage:21s} {result["rows"]:>11,d} rows {result["seconds"]:9.3f} s {result["rows_per_sec"]:>14,.0f} rows/s '
+            f'{result["peak_rss_mb"]:8.1f} MB peak', file = sys.stderr)
+  report = {'meta' : metadata(args), 'results' : results}
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent = 2)
+  else:
+    print(json.dumps(report, indent = 2))
+  if args.baseline:
+    with open(args.baseline) as f:
+      slower = regressions(results, json.load(f), args.tolerance)
+    for stage, before, after in slower:
+      print(f'regression: {stage} {before:,.0f} -> {after:,.0f} rows/s', file = sys.stderr)
+    if slower:
+      sys.exit(1)
+  if any('error' in r for r in results):
+    sys.exit(1)
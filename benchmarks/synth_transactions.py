@@ -0,0 +1,96 @@
+# CDNOW-like transactions at any scale, resampled customer by customer from
+# data/CDnow_MasterData.csv. Customers are generated in blocks, so memory stays bounded
+# whatever the row count.
+# Run from the repository root: python benchmarks/synth_transactions.py 10000000 tx.csv
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GUI'))
+from rfm_builder import TRANSACTION_DTYPES, clean_transactions, to_days
+
+SOURCE = 'data/CDnow_MasterData.csv'
+START = np.datetime64('1997-01-01')
+END = np.datetime64('1998-06-30')
+MAX_SHIFT = 15
+
+# the real sample, one block of rows per customer
+def fit_profile(path = SOURCE):
+  df = clean_transactions(pd.read_csv(path, dtype = TRANSACTION_DTYPES))
+  df = df.assign(day = to_days(df['date']) - int(START.astype(int)))
+  df = df.sort_values(['customer_id', 'day'], kind = 'stable')
+  counts = df.groupby('customer_id', sort = False).size().to_numpy()
+  starts = np.cumsum(counts) - counts
+  day = df['day'].to_numpy()
+  return {
+    'counts' : counts,
+    'starts' : starts,
+    'first_day' : day[starts],
+    'last_day' : day[starts + counts - 1],
+    'day' : day,
+    'quantity' : df['purchased_quantity'].to_numpy(),
+    'sale' : df['sale'].to_numpy(),
+  }
+
+# DataFrame chunks with the columns of data/CDnow_MasterData.csv. Each synthetic customer
+# replays a random real customer's purchases, shifted by up to MAX_SHIFT days (inside the
+# CDNOW window) with spend scaled by a lognormal factor, so order counts, gaps and basket
+# sizes keep their joint distribution.
+def generate(profile, n_rows, seed = 0, block_customers = 200_000):
+  rng = np.random.default_rng(seed)
+  horizon = int((END - START).astype(int))
+  width = max(5, len(str(n_rows)))
+  produced = 0
+  next_id = 1
+  while produced < n_rows:
+    pick = rng.integers(0, len(profile['counts']), block_customers)
+    counts = profile['counts'][pick]
+    starts = np.cumsum(counts) - counts
+    idx = np.arange(counts.sum()) + np.repeat(profile['starts'][pick] - starts, counts)
+    low = np.maximum(-MAX_SHIFT, -profile['first_day'][pick])
+    high = np.minimum(MAX_SHIFT, horizon - profile['last_day'][pick])
+    shift = rng.integers(low, high + 1)
+    factor = rng.lognormal(0, 0.1, block_customers)
+    rows = min(len(idx), n_rows - produced)
+    idx = idx[:rows]
+    owner = np.repeat(np.arange(block_customers), counts)[:rows]
+    yield pd.DataFrame({
+      'customer_id' : np.char.zfill((owner + next_id).astype(str), width),
+      'date' : (START + profile['day'][idx] + shift[owner]).astype(str),
+      'purchased_quantity' : profile['quantity'][idx].astype(np.int32),
+      'sale' : np.round(profile['sale'][idx] * factor[owner], 2)})
+    produced += rows
+    next_id += block_customers
+
+def write(path, n_rows, seed = 0, profile = None):
+  profile = profile or fit_profile()
+  writer = None
+  try:
+    for i, chunk in enumerate(generate(profile, n_rows, seed)):
+      if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(chunk, preserve_index = False)
+        writer = writer or pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+      else:
+        chunk.to_csv(path, mode = 'w' if i == 0 else 'a', header = i == 0, index = False)
+  finally:
+    if writer is not None:
+      writer.close()
+  return path
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description = 'Write synthetic CDNOW-like transactions')
+  parser.add_argument('rows', type = int)
+  parser.add_argument('output', help = 'csv or parquet path')
+  parser.add_argument('--seed', type = int, default = 0)
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  write(args.output, args.rows, args.seed)
+  print(f'{args.rows} rows written to {args.output} in {time.perf_counter() - start:.1f}s')